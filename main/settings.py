@@ -30,12 +30,14 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
-    'django.contrib.staticfiles',
+    # videos раньше staticfiles: его collectstatic сначала собирает фронтенд
     'videos',
+    'django.contrib.staticfiles',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -77,13 +79,58 @@ else:
     DB_PATH = BASE_DIR / 'db.sqlite3'
     MEDIA_ROOT = BASE_DIR / 'media'
 
+# Профиль SQLite для нескольких воркеров gunicorn: WAL позволяет читать во
+# время записи, busy_timeout ждёт блокировку вместо "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.getenv('DJANGO_SQLITE_BUSY_TIMEOUT', '5000')),  # мс
+    'mmap_size': 256 * 1024 * 1024,  # 256MB
+    'cache_size': -32000,  # ~32MB (отрицательное значение — в КиБ)
+    'temp_store': 'MEMORY',
+}
+# journal_mode меняет файл базы — на соединении только для чтения его не задаём
+SQLITE_READONLY_PRAGMAS = {
+    key: value for key, value in SQLITE_PRAGMAS.items() if key != 'journal_mode'
+}
+
+
+def sqlite_init_command(pragmas):
+    """Собирает PRAGMA для выполнения при каждом подключении"""
+    return ';'.join(f'PRAGMA {key}={value}' for key, value in pragmas.items())
+
+
+CONN_MAX_AGE = int(os.getenv('DJANGO_CONN_MAX_AGE', '600'))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': DB_PATH,
-    }
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': sqlite_init_command(SQLITE_PRAGMAS),
+            # Писатель сразу берёт блокировку, а не упирается в неё посреди транзакции
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    # Тот же файл, открытый только для чтения — для страниц просмотра
+    'readonly': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{DB_PATH}?mode=ro',
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': sqlite_init_command(SQLITE_READONLY_PRAGMAS),
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
 }
 
+DATABASE_ROUTERS = ['videos.routers.ReadOnlyRouter']
+
 # =============================================================================
 # PASSWORD VALIDATION
 # =============================================================================
@@ -109,9 +156,37 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Сборка фронтенда (python manage.py build_assets, выполняется и в collectstatic):
+# исходники шрифтов в assets/, результат — в static/build/
+ASSETS_SOURCE_DIR = BASE_DIR / 'assets'
+ASSETS_BUILD_DIR = BASE_DIR / 'static' / 'build'
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = MEDIA_ROOT
 
+# Тома для медиа: основной MEDIA_ROOT плюс дополнительные из окружения
+# в формате "имя=путь,имя=путь" (например "hdd2=/mnt/hdd2/media").
+# Имена томов записываются в базу (Video.storage_volume) — не переименовывайте их.
+MEDIA_VOLUMES = {'default': str(MEDIA_ROOT)}
+for volume in os.getenv('DJANGO_MEDIA_VOLUMES', '').split(','):
+    if '=' in volume:
+        volume_name, volume_path = volume.split('=', 1)
+        MEDIA_VOLUMES[volume_name.strip()] = volume_path.strip()
+
+# Каталоги, файлы которых распределяются по томам и по хешированным подкаталогам
+MEDIA_SHARDED_DIRS = ['videos']
+MEDIA_HASHED_DIRS = ['videos', 'thumbnails']
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'videos.storage.ShardedMediaStorage',
+    },
+    # Хешированные имена и .br/.gz для статики собираются в collectstatic
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # =============================================================================
@@ -168,8 +243,6 @@ LOGGING = {
     },
 }
 
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
-
 # =============================================================================
 # VIDEO UPLOAD SETTINGS
 # =============================================================================
@@ -177,4 +250,7 @@ VIDEO_UPLOAD_MAX_MEMORY_SIZE = 500 * 1024 * 1024  # 500MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 500 * 1024 * 1024  # 500MB
 
 ALLOWED_VIDEO_EXTENSIONS = ['mp4', 'webm', 'mov', 'avi', 'mkv']
-MAX_VIDEO_SIZE_MB = 500
\ No newline at end of file
+MAX_VIDEO_SIZE_MB = 500
+
+# Целевая длительность сегмента HLS/DASH в секундах (режется по ключевым кадрам)
+STREAM_SEGMENT_DURATION = 4
\ No newline at end of file
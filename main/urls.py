@@ -1,20 +1,16 @@
 from django.contrib import admin
 from django.urls import path, include
-from django.conf import settings
-from django.conf.urls.static import static
-from django.views.static import serve
 from django.urls import re_path
+from videos.views import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('videos.urls')),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-else:
-    urlpatterns += [
-        re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
-        re_path(r'^static/(?P<path>.*)$', serve, {'document_root': settings.STATIC_ROOT}),
-    ]
\ No newline at end of file
+# Медиа может лежать на нескольких томах — раздаём через хранилище
+urlpatterns += [
+    re_path(r'^media/(?P<path>.*)$', serve_media),
+]
+
+# Статику отдаёт WhiteNoise (с готовыми .br/.gz вариантами), в DEBUG — runserver
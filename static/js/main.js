@@ -3,6 +3,7 @@ document.addEventListener('DOMContentLoaded', () => {
     initParticles();
     createDeleteModal();
     createActionsModal();
+    initBatchActions();
 });
 
 // =============================================================================
@@ -10,15 +11,22 @@ document.addEventListener('DOMContentLoaded', () => {
 // =============================================================================
 
 function initScrollProgress() {
+    const scrollProgress = document.getElementById('scrollProgress');
+    if (!scrollProgress) return;
+    
+    // Не чаще одного обновления за кадр
+    let ticking = false;
     window.addEventListener('scroll', () => {
-        const scrollProgress = document.getElementById('scrollProgress');
-        if (scrollProgress) {
+        if (ticking) return;
+        ticking = true;
+        requestAnimationFrame(() => {
             const scrollTop = window.pageYOffset || document.documentElement.scrollTop;
             const scrollHeight = document.documentElement.scrollHeight - document.documentElement.clientHeight;
-            const progress = (scrollTop / scrollHeight) * 100;
+            const progress = scrollHeight > 0 ? (scrollTop / scrollHeight) * 100 : 0;
             scrollProgress.style.width = progress + '%';
-        }
-    });
+            ticking = false;
+        });
+    }, { passive: true });
 }
 
 // =============================================================================
@@ -27,8 +35,16 @@ function initScrollProgress() {
 
 function initParticles() {
     const particlesContainer = document.getElementById('particles');
-    if (particlesContainer) {
-        const particleCount = particlesContainer.closest('body').querySelector('.gallery') ? 50 : 30;
+    if (!particlesContainer) return;
+    
+    // Пользователь попросил меньше анимации — частицы не создаём
+    if (window.matchMedia('(prefers-reduced-motion: reduce)').matches) return;
+    
+    // Декоративный эффект не должен конкурировать с первой отрисовкой
+    const schedule = window.requestIdleCallback || ((callback) => setTimeout(callback, 200));
+    schedule(() => {
+        const particleCount = document.querySelector('.gallery') ? 50 : 30;
+        const fragment = document.createDocumentFragment();
         
         for (let i = 0; i < particleCount; i++) {
             const particle = document.createElement('div');
@@ -39,9 +55,11 @@ function initParticles() {
             particle.style.setProperty('--ty', (Math.random() - 0.5) * 200 + 'px');
             particle.style.animationDelay = Math.random() * 20 + 's';
             particle.style.animationDuration = (Math.random() * 10 + 15) + 's';
-            particlesContainer.appendChild(particle);
+            fragment.appendChild(particle);
         }
-    }
+        
+        particlesContainer.appendChild(fragment);
+    });
 }
 
 // =============================================================================
@@ -494,6 +512,102 @@ function confirmDeleteVideo(videoId) {
     });
 }
 
+// =============================================================================
+// ПАКЕТНЫЕ ОПЕРАЦИИ
+// =============================================================================
+
+function initBatchActions() {
+    const toolbar = document.getElementById('batchToolbar');
+    if (!toolbar) return;
+    
+    const selectAll = document.getElementById('batchSelectAll');
+    const checkboxes = document.querySelectorAll('.batch-checkbox');
+    const editBtn = document.getElementById('batchEditBtn');
+    const thumbBtn = document.getElementById('batchThumbBtn');
+    const deleteBtn = document.getElementById('batchDeleteBtn');
+    
+    const update = () => {
+        const count = getSelectedVideoIds().length;
+        document.getElementById('batchCount').textContent = `Выбрано: ${count}`;
+        [editBtn, thumbBtn, deleteBtn].forEach(btn => {
+            btn.disabled = count === 0;
+        });
+        selectAll.checked = count > 0 && count === checkboxes.length;
+    };
+    
+    checkboxes.forEach(checkbox => checkbox.addEventListener('change', update));
+    selectAll.addEventListener('change', () => {
+        checkboxes.forEach(checkbox => {
+            checkbox.checked = selectAll.checked;
+        });
+        update();
+    });
+    
+    editBtn.addEventListener('click', () => {
+        const field = document.getElementById('batchField').value;
+        const value = document.getElementById('batchValue').value.trim();
+        const items = getSelectedVideoIds().map(id => ({ id, [field]: value }));
+        sendBatchRequest('/videos/batch/edit/', { items });
+    });
+    
+    thumbBtn.addEventListener('click', () => {
+        sendBatchRequest('/videos/batch/thumbnails/', { ids: getSelectedVideoIds() });
+    });
+    
+    deleteBtn.addEventListener('click', () => {
+        const ids = getSelectedVideoIds();
+        showDeleteModal(null, `${ids.length} видео`);
+        
+        // Подменяем обработчик подтверждения на пакетное удаление
+        const confirmBtn = document.getElementById('confirmDeleteBtn');
+        const newConfirmBtn = confirmBtn.cloneNode(true);
+        confirmBtn.parentNode.replaceChild(newConfirmBtn, confirmBtn);
+        newConfirmBtn.addEventListener('click', () => {
+            closeDeleteModal();
+            sendBatchRequest('/videos/batch/delete/', { ids });
+        });
+    });
+}
+
+function getSelectedVideoIds() {
+    return Array.from(document.querySelectorAll('.batch-checkbox:checked'))
+        .map(checkbox => parseInt(checkbox.value, 10));
+}
+
+function sendBatchRequest(url, payload) {
+    const csrftoken = getCookie('csrftoken');
+    
+    fetch(url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': csrftoken,
+            'X-Requested-With': 'XMLHttpRequest'
+        },
+        body: JSON.stringify(payload)
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            const failed = (data.results || []).filter(result => !result.success);
+            showMessage(data.message, failed.length ? 'error' : 'success');
+            failed.forEach(result => {
+                showMessage(`Видео #${result.id}: ${result.error}`, 'error');
+            });
+            
+            setTimeout(() => {
+                window.location.reload();
+            }, 1500);
+        } else {
+            showMessage(data.error || 'Ошибка пакетной операции', 'error');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        showMessage('Ошибка пакетной операции', 'error');
+    });
+}
+
 // =============================================================================
 // УТИЛИТЫ
 // =============================================================================
@@ -0,0 +1,761 @@
+"""
+Упаковка MP4 (H.264/AAC) во фрагментированный MP4 без перекодирования.
+
+Читаем только moov исходного файла: по таблицам сэмплов (stts, ctts, stss,
+stsz, stsc, stco/co64) строим список сэмплов, режем его на сегменты по
+ключевым кадрам и отдаём init-сегмент (ftyp + moov с mvex) и фрагменты
+(moof + mdat). Данные сэмплов копируются из исходного файла кусками, файл
+целиком в память не загружается.
+"""
+import bisect
+import math
+import os
+import struct
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Верхняя граница числа сэмплов в дорожке (≈ 19 часов видео 60 к/с).
+# Таблицы разворачиваются в массивы по ~28 байт на сэмпл, поэтому счётчики
+# из файла проверяются до выделения памяти
+MAX_SAMPLES = 1 << 22
+
+# Сколько сэмплов (суммарно по всем дорожкам) держать в кеше разобранных
+# файлов на процесс: ~2 млн сэмплов ≈ 60 МБ — около 45 десятиминутных роликов
+PACKAGE_CACHE_SAMPLES = 2_000_000
+
+VIDEO_CODECS = (b'avc1', b'avc3')
+AUDIO_CODECS = (b'mp4a',)
+
+# Флаги сэмплов в trun: ключевой кадр / зависимый кадр
+SAMPLE_FLAGS_SYNC = 0x02000000
+SAMPLE_FLAGS_NON_SYNC = 0x01010000
+
+
+class UnsupportedMediaError(Exception):
+    """Файл нельзя упаковать без перекодирования"""
+
+
+# =============================================================================
+# ЧТЕНИЕ БОКСОВ
+# =============================================================================
+
+def _iter_boxes(data):
+    """Разбирает последовательность боксов: (тип, содержимое, бокс целиком)"""
+    offset, end = 0, len(data)
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise UnsupportedMediaError(f'Повреждённый бокс {box_type!r}')
+        yield box_type, data[offset + header:offset + size], data[offset:offset + size]
+        offset += size
+
+
+def _children(data):
+    return list(_iter_boxes(data))
+
+
+def _find(children, box_type):
+    for child_type, payload, raw in children:
+        if child_type == box_type:
+            return payload, raw
+    return None, None
+
+
+def _read_moov(f):
+    """Находит moov на верхнем уровне файла, пропуская mdat через seek"""
+    f.seek(0, os.SEEK_END)
+    file_size = f.tell()
+    offset = 0
+    moov = None
+
+    while offset + 8 <= file_size:
+        f.seek(offset)
+        header = f.read(16)
+        size, box_type = struct.unpack('>I4s', header[:8])
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', header[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - offset
+        if size < header_size:
+            raise UnsupportedMediaError('Повреждённая структура файла')
+        if offset + size > file_size:
+            raise UnsupportedMediaError('Файл обрезан')
+
+        if box_type == b'moov':
+            f.seek(offset + header_size)
+            moov = f.read(size - header_size)
+        elif box_type == b'moof':
+            raise UnsupportedMediaError('Файл уже фрагментирован')
+        offset += size
+
+    if moov is None:
+        raise UnsupportedMediaError('В файле нет moov')
+    return moov, file_size
+
+
+def _uint_array(typecode, data, count):
+    """Массив big-endian чисел из таблицы бокса"""
+    values = array(typecode)
+    if count * values.itemsize > len(data):
+        raise UnsupportedMediaError('Таблица сэмплов обрезана')
+    values.frombytes(bytes(data[:count * values.itemsize]))
+    if sys.byteorder == 'little':
+        values.byteswap()
+    return values
+
+
+def _table(box, box_name, columns=1, typecode='I', header=8):
+    """
+    Таблица полного бокса: число записей берётся из заголовка и сверяется
+    с размером бокса до чтения, поэтому повреждённый счётчик не приводит
+    к выделению памяти
+    """
+    if box is None:
+        raise UnsupportedMediaError(f'Нет {box_name}')
+    if len(box) < header:
+        raise UnsupportedMediaError(f'Бокс {box_name} обрезан')
+    entries = struct.unpack_from('>I', box, header - 4)[0]
+    return entries, _uint_array(typecode, box[header:], entries * columns)
+
+
+def _expand_runs(table, count, typecode, name):
+    """Разворачивает пары (количество, значение) из stts/ctts в массив на сэмпл"""
+    if sum(table[0::2]) != count:
+        raise UnsupportedMediaError(f'{name} не совпадает с числом сэмплов')
+    values = array(typecode)
+    for i in range(0, len(table), 2):
+        values.extend(array(typecode, [table[i + 1]]) * table[i])
+    return values
+
+
+# =============================================================================
+# ЗАПИСЬ БОКСОВ
+# =============================================================================
+
+def _box(box_type, *payload):
+    body = b''.join(payload)
+    return struct.pack('>I4s', 8 + len(body), box_type) + body
+
+
+def _full_box(box_type, version, flags, *payload):
+    return _box(box_type, struct.pack('>I', (version << 24) | flags), *payload)
+
+
+# =============================================================================
+# ДОРОЖКИ
+# =============================================================================
+
+def _read_descriptor(data, pos):
+    """MPEG-4 дескриптор из esds: (тег, начало содержимого, конец)"""
+    tag = data[pos]
+    pos += 1
+    size = 0
+    for _ in range(4):
+        byte = data[pos]
+        pos += 1
+        size = (size << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            break
+    return tag, pos, pos + size
+
+
+def _audio_codec(entry):
+    """Строка кодека для AAC вида mp4a.40.2"""
+    # Версия звукового описания QuickTime добавляет поля перед дочерними боксами
+    version = struct.unpack_from('>H', entry, 8)[0]
+    children_start = {1: 44, 2: 64}.get(version, 28)
+    esds, _ = _find(_children(entry[children_start:]), b'esds')
+    if esds is None:
+        return 'mp4a.40.2'
+
+    try:
+        data = esds[4:]
+        tag, start, end = _read_descriptor(data, 0)
+        if tag != 0x03:
+            return 'mp4a.40.2'
+        flags = data[start + 2]
+        pos = start + 3
+        if flags & 0x80:
+            pos += 2
+        if flags & 0x40:
+            pos += 1 + data[pos]
+        if flags & 0x20:
+            pos += 2
+
+        tag, start, end = _read_descriptor(data, pos)
+        if tag != 0x04:
+            return 'mp4a.40.2'
+        object_type = data[start]
+        tag, start, end = _read_descriptor(data, start + 13)
+        if object_type != 0x40 or tag != 0x05:
+            return f'mp4a.{object_type:02x}'
+        audio_object_type = data[start] >> 3
+        if audio_object_type == 31:
+            audio_object_type = 32 + (((data[start] & 0x07) << 3) | (data[start + 1] >> 5))
+        return f'mp4a.40.{audio_object_type}'
+    except IndexError:
+        return 'mp4a.40.2'
+
+
+class Track:
+    """Дорожка исходного файла и развёрнутые таблицы её сэмплов"""
+
+    def __init__(self, trak, file_size):
+        self.file_size = file_size
+        children = _children(trak)
+        tkhd, self.tkhd_raw = _find(children, b'tkhd')
+        edts, self.edts_raw = _find(children, b'edts')
+        mdia, _ = _find(children, b'mdia')
+        if tkhd is None or mdia is None:
+            raise UnsupportedMediaError('Дорожка без tkhd/mdia')
+
+        if tkhd[0] == 1:
+            self.track_id = struct.unpack_from('>I', tkhd, 20)[0]
+            self.width, self.height = struct.unpack_from('>II', tkhd, 88)
+        else:
+            self.track_id = struct.unpack_from('>I', tkhd, 12)[0]
+            self.width, self.height = struct.unpack_from('>II', tkhd, 76)
+        self.width >>= 16
+        self.height >>= 16
+
+        mdia_children = _children(mdia)
+        mdhd, self.mdhd_raw = _find(mdia_children, b'mdhd')
+        hdlr, self.hdlr_raw = _find(mdia_children, b'hdlr')
+        minf, _ = _find(mdia_children, b'minf')
+        if mdhd is None or hdlr is None or minf is None:
+            raise UnsupportedMediaError('Дорожка без mdhd/hdlr/minf')
+
+        offset = 20 if mdhd[0] == 1 else 12
+        self.timescale = struct.unpack_from('>I', mdhd, offset)[0]
+        self.handler = bytes(hdlr[8:12])
+        self.sample_entry_type = None
+        self.codec = None
+        if self.handler not in (b'vide', b'soun'):
+            # Таймкод, субтитры и т.п. в поток не попадают
+            return
+
+        self.minf_children = _children(minf)
+        stbl, _ = _find(self.minf_children, b'stbl')
+        if stbl is None:
+            raise UnsupportedMediaError('Дорожка без stbl')
+        self._parse_sample_table(_children(stbl))
+        self._parse_edit_list(edts)
+
+    @property
+    def kind(self):
+        if self.handler == b'vide' and self.sample_entry_type in VIDEO_CODECS:
+            return 'video'
+        if self.handler == b'soun' and self.sample_entry_type in AUDIO_CODECS:
+            return 'audio'
+        return None
+
+    def _parse_sample_table(self, stbl):
+        stsd, self.stsd_raw = _find(stbl, b'stsd')
+        if stsd is None or len(stsd) < 8 or struct.unpack_from('>I', stsd, 4)[0] != 1:
+            raise UnsupportedMediaError('Ожидалось одно описание сэмплов в stsd')
+        entry_type, entry, _ = next(_iter_boxes(stsd[8:]), (None, None, None))
+        if entry_type is None:
+            raise UnsupportedMediaError('Пустой stsd')
+        self.sample_entry_type = entry_type
+        if entry_type in VIDEO_CODECS:
+            avcc, _ = _find(_children(entry[78:]), b'avcC')
+            if avcc is None or len(avcc) < 4:
+                raise UnsupportedMediaError('Нет avcC в описании H.264')
+            self.codec = f'{entry_type.decode()}.{avcc[1]:02x}{avcc[2]:02x}{avcc[3]:02x}'
+        elif entry_type in AUDIO_CODECS:
+            self.codec = _audio_codec(entry)
+        else:
+            self.codec = entry_type.decode('latin-1')
+
+        # Размеры
+        stsz, _ = _find(stbl, b'stsz')
+        if stsz is None or len(stsz) < 12:
+            raise UnsupportedMediaError('Нет stsz')
+        sample_size, count = struct.unpack_from('>II', stsz, 4)
+        if count > MAX_SAMPLES:
+            raise UnsupportedMediaError(f'Слишком много сэмплов: {count}')
+        if sample_size:
+            # Сэмплы не могут занимать больше, чем весь файл
+            if sample_size * count > self.file_size:
+                raise UnsupportedMediaError('stsz не помещается в файл')
+            self.sizes = array('I', [sample_size]) * count
+        else:
+            self.sizes = _uint_array('I', stsz[12:], count)
+        self.count = count
+
+        # Время декодирования и длительности
+        stts, _ = _find(stbl, b'stts')
+        _, table = _table(stts, 'stts', columns=2)
+        self.durations = _expand_runs(table, count, 'I', 'stts')
+        self.dts = array('Q', [0]) * count
+        total = 0
+        for i, duration in enumerate(self.durations):
+            self.dts[i] = total
+            total += duration
+        self.end_time = total
+
+        # Смещения композиции (B-кадры)
+        self.cts = None
+        self.negative_cts = False
+        ctts, _ = _find(stbl, b'ctts')
+        if ctts is not None:
+            _, table = _table(ctts, 'ctts', columns=2)
+            table = list(table)
+            for i in range(1, len(table), 2):
+                if table[i] >= 0x80000000:
+                    table[i] -= 0x100000000
+                    self.negative_cts = True
+            self.cts = _expand_runs(table, count, 'i', 'ctts')
+
+        # Ключевые кадры (без stss ключевые все)
+        self.sync = None
+        stss, _ = _find(stbl, b'stss')
+        if stss is not None:
+            _, table = _table(stss, 'stss')
+            if any(n < 1 or n > count for n in table):
+                raise UnsupportedMediaError('stss ссылается на несуществующий сэмпл')
+            self.sync = sorted(n - 1 for n in table)
+
+        # Смещения сэмплов в файле
+        stsc, _ = _find(stbl, b'stsc')
+        entries, stsc_table = _table(stsc, 'stsc', columns=3)
+        stco, _ = _find(stbl, b'stco')
+        if stco is not None:
+            _, chunk_offsets = _table(stco, 'stco')
+        else:
+            co64, _ = _find(stbl, b'co64')
+            if co64 is None:
+                raise UnsupportedMediaError('Нет stco/co64')
+            _, chunk_offsets = _table(co64, 'co64', typecode='Q')
+
+        self.offsets = array('Q', [0]) * count
+        sample = 0
+        for entry in range(entries):
+            first_chunk = stsc_table[entry * 3] - 1
+            per_chunk = stsc_table[entry * 3 + 1]
+            if entry + 1 < entries:
+                last_chunk = stsc_table[(entry + 1) * 3] - 1
+            else:
+                last_chunk = len(chunk_offsets)
+            if not 0 <= first_chunk < last_chunk <= len(chunk_offsets):
+                raise UnsupportedMediaError('stsc ссылается на несуществующий чанк')
+            for chunk in range(first_chunk, last_chunk):
+                offset = chunk_offsets[chunk]
+                for _ in range(min(per_chunk, count - sample)):
+                    self.offsets[sample] = offset
+                    offset += self.sizes[sample]
+                    sample += 1
+                if offset > self.file_size:
+                    raise UnsupportedMediaError('Сэмплы выходят за пределы файла')
+                if sample >= count:
+                    break
+        if sample != count:
+            raise UnsupportedMediaError('stsc/stco не покрывают все сэмплы')
+
+    def _parse_edit_list(self, edts):
+        """
+        Первая непустая правка из elst: с какого момента медиа-времени дорожки
+        начинается показ (media_time) и сколько пустого времени до этого
+        (empty_duration, в единицах mvhd). Нужна для presentationTimeOffset в DASH.
+        """
+        self.media_time = 0
+        self.empty_duration = 0
+        if edts is None:
+            return
+        elst, _ = _find(_children(edts), b'elst')
+        if elst is None or len(elst) < 8:
+            return
+        version = elst[0]
+        entry_format = '>Qq' if version == 1 else '>Ii'
+        entry_size = 20 if version == 1 else 12
+        entries = struct.unpack_from('>I', elst, 4)[0]
+        if 8 + entries * entry_size > len(elst):
+            raise UnsupportedMediaError('Бокс elst обрезан')
+        for i in range(entries):
+            duration, media_time = struct.unpack_from(entry_format, elst, 8 + i * entry_size)
+            if media_time == -1:
+                self.empty_duration += duration
+                continue
+            self.media_time = media_time
+            return
+
+    def presentation_offset(self, movie_timescale):
+        """
+        Сдвиг показа относительно tfdt в единицах дорожки (presentationTimeOffset).
+        Пустая правка (задержка) должна была бы дать отрицательный сдвиг,
+        который DASH не допускает, поэтому он ограничивается нулём.
+        """
+        delay = round(self.empty_duration * self.timescale / movie_timescale) if movie_timescale else 0
+        return max(0, self.media_time - delay)
+
+    def is_sync(self, index):
+        if self.sync is None:
+            return True
+        position = bisect.bisect_left(self.sync, index)
+        return position < len(self.sync) and self.sync[position] == index
+
+    def init_trak(self, with_edit_list=True):
+        """trak для init-сегмента: описание кодека без таблиц сэмплов"""
+        empty = struct.pack('>I', 0)
+        stbl = _box(
+            b'stbl',
+            self.stsd_raw,
+            _full_box(b'stts', 0, 0, empty),
+            _full_box(b'stsc', 0, 0, empty),
+            _full_box(b'stsz', 0, 0, empty, empty),
+            _full_box(b'stco', 0, 0, empty),
+        )
+        minf = _box(b'minf', *(
+            stbl if child_type == b'stbl' else raw
+            for child_type, _, raw in self.minf_children
+        ))
+        mdia = _box(b'mdia', self.mdhd_raw, self.hdlr_raw, minf)
+        edts = self.edts_raw if with_edit_list else None
+        return _box(b'trak', self.tkhd_raw, edts or b'', mdia)
+
+    def traf(self, start, end, data_offset):
+        """traf с trun для сэмплов [start, end)"""
+        flags = 0x000001 | 0x000100 | 0x000200 | 0x000400
+        if self.cts is not None:
+            flags |= 0x000800
+        version = 1 if self.negative_cts else 0
+
+        entries = []
+        for i in range(start, end):
+            sample_flags = SAMPLE_FLAGS_SYNC if self.is_sync(i) else SAMPLE_FLAGS_NON_SYNC
+            entries.append(struct.pack('>III', self.durations[i], self.sizes[i], sample_flags))
+            if self.cts is not None:
+                entries.append(struct.pack('>i' if version else '>I', self.cts[i]))
+
+        return _box(
+            b'traf',
+            _full_box(b'tfhd', 0, 0x020000, struct.pack('>I', self.track_id)),
+            _full_box(b'tfdt', 1, 0, struct.pack('>Q', self.dts[start] if start < self.count else self.end_time)),
+            _full_box(b'trun', version, flags, struct.pack('>Ii', end - start, data_offset), *entries),
+        )
+
+    def data_size(self, start, end):
+        return sum(self.sizes[start:end])
+
+    def data_ranges(self, start, end):
+        """Непрерывные диапазоны байт исходного файла для сэмплов [start, end)"""
+        if start >= end:
+            return
+        range_start = self.offsets[start]
+        range_size = self.sizes[start]
+        for i in range(start + 1, end):
+            if self.offsets[i] == range_start + range_size:
+                range_size += self.sizes[i]
+            else:
+                yield range_start, range_size
+                range_start = self.offsets[i]
+                range_size = self.sizes[i]
+        yield range_start, range_size
+
+
+# =============================================================================
+# ПАКЕТ
+# =============================================================================
+
+class Package:
+    """Фрагментированное представление MP4: init-сегмент, фрагменты, плейлисты"""
+
+    def __init__(self, path, segment_duration):
+        self.path = path
+        with open(path, 'rb') as f:
+            moov, file_size = _read_moov(f)
+
+        # Любая ошибка разбора повреждённого moov означает одно: файл
+        # нельзя отдать потоком, и вызывающему коду достаточно одного исключения
+        try:
+            self._parse(moov, file_size, segment_duration)
+        except (struct.error, IndexError, KeyError, TypeError, ValueError, OverflowError) as e:
+            raise UnsupportedMediaError(f'Повреждённый moov: {e!r}') from e
+
+    def _parse(self, moov, file_size, segment_duration):
+        children = _children(moov)
+        mvhd, self.mvhd_raw = _find(children, b'mvhd')
+        if mvhd is None:
+            raise UnsupportedMediaError('Нет mvhd')
+        if _find(children, b'mvex')[0] is not None:
+            raise UnsupportedMediaError('Файл уже фрагментирован')
+        if mvhd[0] == 1:
+            self.movie_timescale, self.movie_duration = struct.unpack_from('>IQ', mvhd, 20)
+        else:
+            self.movie_timescale, self.movie_duration = struct.unpack_from('>II', mvhd, 12)
+
+        tracks = [Track(payload, file_size) for box_type, payload, _ in children if box_type == b'trak']
+        video = [track for track in tracks if track.kind == 'video']
+        audio = [track for track in tracks if track.kind == 'audio']
+        unsupported = [
+            track for track in tracks
+            if track.kind is None and track.handler in (b'vide', b'soun')
+        ]
+        if unsupported:
+            raise UnsupportedMediaError(f'Кодек {unsupported[0].codec} не поддерживается (нужны H.264/AAC)')
+        if len(video) > 1 or len(audio) > 1 or not (video or audio):
+            raise UnsupportedMediaError('Нужна одна видео и/или одна аудио дорожка')
+
+        self.tracks = video + audio
+        self.main_track = self.tracks[0]
+        if self.main_track.count == 0:
+            raise UnsupportedMediaError('В файле нет сэмплов')
+        if not self.main_track.is_sync(0):
+            raise UnsupportedMediaError('Первый кадр не ключевой')
+        self._build_segments(segment_duration)
+
+    @property
+    def codecs(self):
+        return ','.join(track.codec for track in self.tracks)
+
+    @property
+    def duration(self):
+        return self.main_track.end_time / self.main_track.timescale
+
+    @property
+    def sample_count(self):
+        return sum(track.count for track in self.tracks)
+
+    def _build_segments(self, segment_duration):
+        """Границы сегментов по ключевым кадрам главной дорожки"""
+        main = self.main_track
+        target = segment_duration * main.timescale
+        sync_samples = main.sync if main.sync is not None else range(main.count)
+
+        boundaries = [0]
+        for index in sync_samples:
+            if main.dts[index] >= main.dts[boundaries[-1]] + target:
+                boundaries.append(index)
+        times = [main.dts[index] / main.timescale for index in boundaries]
+
+        # Остальные дорожки режем по тем же моментам времени
+        starts = {}
+        for track in self.tracks:
+            if track is main:
+                starts[track.track_id] = boundaries + [main.count]
+            else:
+                starts[track.track_id] = [
+                    bisect.bisect_left(track.dts, round(t * track.timescale)) for t in times
+                ] + [track.count]
+                starts[track.track_id][0] = 0
+
+        self.segments = []
+        for i in range(len(boundaries)):
+            start_dts = main.dts[boundaries[i]]
+            end_dts = main.dts[boundaries[i + 1]] if i + 1 < len(boundaries) else main.end_time
+            self.segments.append({
+                'start': start_dts,
+                'duration': end_dts - start_dts,
+                'ranges': [
+                    (track, starts[track.track_id][i], starts[track.track_id][i + 1])
+                    for track in self.tracks
+                ],
+            })
+
+    def select_tracks(self, track_id=None):
+        """Все дорожки (мультиплекс для HLS) или одна (для DASH)"""
+        if track_id is None:
+            return self.tracks
+        tracks = [track for track in self.tracks if track.track_id == track_id]
+        if not tracks:
+            raise KeyError(track_id)
+        return tracks
+
+    def init_segment(self, track_id=None):
+        """
+        ftyp + moov с mvex: описания кодеков без сэмплов.
+        Init-сегмент одной дорожки (DASH) идёт без edts: правка передаётся
+        в MPD через presentationTimeOffset, иначе она применялась бы дважды
+        """
+        tracks = self.select_tracks(track_id)
+        ftyp = _box(b'ftyp', b'iso6', struct.pack('>I', 0), b'iso6', b'isom', b'mp41')
+        mvex = [_full_box(b'mehd', 1, 0, struct.pack('>Q', self.movie_duration))]
+        mvex += [
+            _full_box(b'trex', 0, 0, struct.pack('>IIIII', track.track_id, 1, 0, 0, 0))
+            for track in tracks
+        ]
+        moov = _box(
+            b'moov',
+            self.mvhd_raw,
+            *(track.init_trak(with_edit_list=track_id is None) for track in tracks),
+            _box(b'mvex', *mvex),
+        )
+        return ftyp + moov
+
+    def fragment(self, index, track_id=None):
+        """
+        Возвращает (размер, итератор байт) фрагмента moof + mdat.
+        Данные сэмплов читаются из исходного файла по мере отдачи.
+        """
+        tracks = self.select_tracks(track_id)
+        segment = self.segments[index]
+        ranges = [
+            (track, start, end) for track, start, end in segment['ranges']
+            if start < end and track in tracks
+        ]
+        sizes = [track.data_size(start, end) for track, start, end in ranges]
+        data_size = sum(sizes)
+        if data_size + 8 > 0xFFFFFFFF:
+            mdat_header = struct.pack('>I4sQ', 1, b'mdat', data_size + 16)
+        else:
+            mdat_header = struct.pack('>I4s', data_size + 8, b'mdat')
+
+        def build_moof(moof_size):
+            offset = moof_size + len(mdat_header)
+            trafs = []
+            for (track, start, end), size in zip(ranges, sizes):
+                trafs.append(track.traf(start, end, offset))
+                offset += size
+            return _box(b'moof', _full_box(b'mfhd', 0, 0, struct.pack('>I', index + 1)), *trafs)
+
+        # Размер moof не зависит от data_offset, поэтому достаточно двух проходов
+        moof = build_moof(len(build_moof(0)))
+        header = moof + mdat_header
+
+        def chunks():
+            yield header
+            with open(self.path, 'rb') as f:
+                for track, start, end in ranges:
+                    for offset, size in track.data_ranges(start, end):
+                        f.seek(offset)
+                        while size > 0:
+                            data = f.read(min(size, READ_CHUNK_SIZE))
+                            if not data:
+                                raise IOError('Исходный файл короче, чем указано в moov')
+                            size -= len(data)
+                            yield data
+
+        return len(header) + data_size, chunks()
+
+    def hls_playlist(self, init_uri='init.mp4', segment_uri='{index}.m4s'):
+        """Медиа-плейлист HLS (VOD) с fMP4 сегментами"""
+        timescale = self.main_track.timescale
+        durations = [segment['duration'] / timescale for segment in self.segments]
+        lines = [
+            '#EXTM3U',
+            '#EXT-X-VERSION:7',
+            f'#EXT-X-TARGETDURATION:{max(1, math.ceil(max(durations)))}',
+            '#EXT-X-MEDIA-SEQUENCE:0',
+            '#EXT-X-PLAYLIST-TYPE:VOD',
+            '#EXT-X-INDEPENDENT-SEGMENTS',
+            f'#EXT-X-MAP:URI="{init_uri}"',
+        ]
+        for index, duration in enumerate(durations):
+            lines.append(f'#EXTINF:{duration:.3f},')
+            lines.append(segment_uri.format(index=index))
+        lines.append('#EXT-X-ENDLIST')
+        return '\n'.join(lines) + '\n'
+
+    def dash_manifest(self, init_uri='init-$RepresentationID$.mp4',
+                      media_uri='$Number$-$RepresentationID$.m4s'):
+        """Статический MPD с SegmentTimeline: по адаптации на каждую дорожку"""
+        max_duration = max(segment['duration'] for segment in self.segments) / self.main_track.timescale
+        adaptation_sets = []
+
+        for track in self.tracks:
+            timeline = []
+            for segment in self.segments:
+                for range_track, start, end in segment['ranges']:
+                    if range_track is not track:
+                        continue
+                    start_dts = track.dts[start] if start < track.count else track.end_time
+                    end_dts = track.dts[end] if end < track.count else track.end_time
+                    # Пустые сегменты бывают только в конце (аудио короче видео)
+                    if end_dts > start_dts:
+                        timeline.append(f'<S t="{start_dts}" d="{end_dts - start_dts}"/>')
+
+            # Правка elst (задержка кодера AAC, B-кадры) в DASH передаётся
+            # через presentationTimeOffset
+            offset = track.presentation_offset(self.movie_timescale)
+            offset_attr = f' presentationTimeOffset="{offset}"' if offset else ''
+
+            track_duration = max(track.end_time / track.timescale, 0.001)
+            bandwidth = int(sum(track.sizes) * 8 / track_duration)
+            if track.kind == 'video':
+                attrs = f'mimeType="video/mp4" width="{track.width}" height="{track.height}"'
+            else:
+                attrs = 'mimeType="audio/mp4"'
+            adaptation_sets.append(
+                f'    <AdaptationSet id="{track.track_id}" contentType="{track.kind}" {attrs} '
+                'segmentAlignment="true" startWithSAP="1">\n'
+                f'      <Representation id="{track.track_id}" codecs="{track.codec}" bandwidth="{bandwidth}">\n'
+                f'        <SegmentTemplate timescale="{track.timescale}"{offset_attr} '
+                f'initialization="{init_uri}" media="{media_uri}" startNumber="0">\n'
+                f'          <SegmentTimeline>{"".join(timeline)}</SegmentTimeline>\n'
+                '        </SegmentTemplate>\n'
+                '      </Representation>\n'
+                '    </AdaptationSet>\n'
+            )
+
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" '
+            'profiles="urn:mpeg:dash:profile:isoff-live:2011" '
+            f'mediaPresentationDuration="PT{self.duration:.3f}S" '
+            f'minBufferTime="PT{math.ceil(max_duration)}S">\n'
+            '  <Period id="0" start="PT0S">\n'
+            + ''.join(adaptation_sets) +
+            '  </Period>\n'
+            '</MPD>\n'
+        )
+
+
+class PackageCache:
+    """
+    Кеш разобранных файлов на процесс. Ключ — путь, запись действительна,
+    пока не изменились размер и mtime файла. Объём ограничен суммарным числом
+    сэмплов (память под таблицы), а не числом файлов: при просмотре многих
+    видео запросы сегментов не разбирают moov заново.
+    """
+
+    def __init__(self, max_samples=PACKAGE_CACHE_SAMPLES):
+        self.max_samples = max_samples
+        self._entries = OrderedDict()
+        self._samples = 0
+        self._lock = threading.Lock()
+
+    def get(self, path, segment_duration):
+        stat = os.stat(path)
+        key = (stat.st_size, stat.st_mtime_ns, segment_duration)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == key:
+                self._entries.move_to_end(path)
+                return entry[1]
+
+        package = Package(path, segment_duration)
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self._samples -= old[1].sample_count
+            self._entries[path] = (key, package)
+            self._samples += package.sample_count
+            while self._samples > self.max_samples and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._samples -= evicted.sample_count
+        return package
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._samples = 0
+
+
+_package_cache = PackageCache()
+
+
+def load_package(path, segment_duration=4):
+    """Пакет для файла; разобранный moov кешируется, пока файл не изменился"""
+    return _package_cache.get(path, segment_duration)
@@ -0,0 +1,217 @@
+"""
+Сборка фронтенда перед collectstatic.
+
+- Шрифт Inter: из исходников в assets/fonts нарезаются WOFF2-подмножества
+  (латиница и кириллица отдельно, браузер качает только нужное по unicode-range).
+- Критический CSS: для каждого шаблона из style.css выбираются правила,
+  селекторы которых ссылаются только на классы/id, встречающиеся в шаблоне
+  (вместе с base.html). Этот CSS встраивается в <head>, а полный style.css
+  загружается без блокировки отрисовки.
+
+Результат пишется в static/build/ и дальше собирается collectstatic
+(хеши в именах, gzip/brotli — через WhiteNoise).
+"""
+import os
+import re
+
+from django.conf import settings
+
+# (исходный файл, значение font-weight в @font-face, суффикс имени)
+FONT_FACES = [
+    ('Inter-Regular.woff2', '300 400', '400'),
+    ('Inter-Medium.woff2', '500', '500'),
+    ('Inter-SemiBold.woff2', '600', '600'),
+    # 900 используется только для логотипа — отдаём Bold вместо отдельного файла
+    ('Inter-Bold.woff2', '700 900', '700'),
+]
+
+UNICODE_RANGES = {
+    'cyrillic': 'U+0301,U+0400-045F,U+0490-0491,U+04B0-04B1,U+2116',
+    'latin': (
+        'U+0000-00FF,U+0131,U+0152-0153,U+02BB-02BC,U+02C6,U+02DA,U+02DC,'
+        'U+0304,U+0308,U+0329,U+2000-206F,U+20AC,U+2122,U+2191,U+2193,'
+        'U+2212,U+2215,U+FEFF,U+FFFD'
+    ),
+}
+
+# Подмножество, которое стоит предзагрузить: основной текст сайта на русском
+PRELOAD_FONT = ('400', 'cyrillic')
+
+
+def font_file_name(suffix, subset):
+    return f'inter-{suffix}-{subset}.woff2'
+
+
+def _parse_unicode_range(value):
+    codepoints = []
+    for part in value.split(','):
+        part = part.strip().upper().removeprefix('U+')
+        if '-' in part:
+            start, end = part.split('-')
+            codepoints.extend(range(int(start, 16), int(end, 16) + 1))
+        else:
+            codepoints.append(int(part, 16))
+    return codepoints
+
+
+# =============================================================================
+# ШРИФТЫ
+# =============================================================================
+
+def build_fonts(log=print):
+    """Нарезает WOFF2-подмножества Inter в static/build/fonts"""
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+
+    source_dir = settings.ASSETS_SOURCE_DIR / 'fonts' / 'inter'
+    output_dir = settings.ASSETS_BUILD_DIR / 'fonts'
+    os.makedirs(output_dir, exist_ok=True)
+
+    options = subset.Options()
+    options.flavor = 'woff2'
+    options.hinting = False
+    options.desubroutinize = True
+    options.name_IDs = ['*']
+    options.layout_features = ['kern', 'liga', 'calt', 'ccmp', 'locl', 'mark', 'mkmk', 'tnum']
+
+    for source_name, _, suffix in FONT_FACES:
+        for subset_name, unicode_range in UNICODE_RANGES.items():
+            font = TTFont(source_dir / source_name)
+            subsetter = subset.Subsetter(options)
+            subsetter.populate(unicodes=_parse_unicode_range(unicode_range))
+            subsetter.subset(font)
+
+            output_path = output_dir / font_file_name(suffix, subset_name)
+            font.flavor = 'woff2'
+            font.save(output_path)
+            font.close()
+            log(f'  {output_path.name}: {round(os.path.getsize(output_path) / 1024, 1)} КБ')
+
+
+# =============================================================================
+# КРИТИЧЕСКИЙ CSS
+# =============================================================================
+
+_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+_CLASS_ATTR_RE = re.compile(r'\bclass\s*=\s*"([^"]*)"')
+_ID_ATTR_RE = re.compile(r'\bid\s*=\s*"([^"]*)"')
+_TEMPLATE_TAG_RE = re.compile(r'{%.*?%}|{{.*?}}|{#.*?#}', re.S)
+_SELECTOR_CLASS_RE = re.compile(r'\.(-?[_a-zA-Z][\w-]*)')
+_SELECTOR_ID_RE = re.compile(r'#(-?[_a-zA-Z][\w-]*)')
+_ANIMATION_RE = re.compile(r'animation(?:-name)?\s*:\s*([^;]+)')
+
+
+def parse_css(css):
+    """
+    Разбирает CSS на верхнеуровневые блоки: (прелюдия, тело).
+    Для @media тело — список вложенных блоков, для остальных — строка.
+    """
+    css = _COMMENT_RE.sub('', css)
+    blocks = []
+    pos = 0
+    while True:
+        start = css.find('{', pos)
+        if start == -1:
+            break
+        prelude = css[pos:start].strip()
+        depth = 1
+        end = start + 1
+        while depth and end < len(css):
+            if css[end] == '{':
+                depth += 1
+            elif css[end] == '}':
+                depth -= 1
+            end += 1
+        body = css[start + 1:end - 1]
+        if prelude.startswith(('@media', '@supports')):
+            blocks.append((prelude, parse_css(body)))
+        else:
+            blocks.append((prelude, body.strip()))
+        pos = end
+    return blocks
+
+
+def template_tokens(path):
+    """Классы и id, которые встречаются в шаблоне"""
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    classes, ids = set(), set()
+    for value in _CLASS_ATTR_RE.findall(source):
+        classes.update(_TEMPLATE_TAG_RE.sub(' ', value).split())
+    for value in _ID_ATTR_RE.findall(source):
+        ids.update(_TEMPLATE_TAG_RE.sub(' ', value).split())
+    return classes, ids
+
+
+def _selector_matches(selector, classes, ids):
+    return (
+        set(_SELECTOR_CLASS_RE.findall(selector)) <= classes
+        and set(_SELECTOR_ID_RE.findall(selector)) <= ids
+    )
+
+
+def _minify(body):
+    body = re.sub(r'\s+', ' ', body).strip()
+    return re.sub(r'\s*([{};:,>])\s*', r'\1', body).rstrip(';')
+
+
+def critical_css(blocks, classes, ids):
+    """Правила, применимые к разметке шаблона, плюс нужные им @keyframes"""
+    keyframes = {}
+    for prelude, body in blocks:
+        if prelude.startswith('@keyframes'):
+            keyframes[prelude.split()[1]] = body
+
+    output = []
+    used_animations = set()
+
+    def select(rules):
+        selected = []
+        for prelude, body in rules:
+            if isinstance(body, list):
+                inner = select(body)
+                if inner:
+                    selected.append(f'{prelude}{{{"".join(inner)}}}')
+            elif prelude.startswith('@'):
+                continue
+            else:
+                selectors = [s.strip() for s in prelude.split(',')]
+                matching = [s for s in selectors if _selector_matches(s, classes, ids)]
+                if matching:
+                    for animation in _ANIMATION_RE.findall(body):
+                        used_animations.update(animation.replace(',', ' ').split())
+                    selected.append(f'{",".join(matching)}{{{_minify(body)}}}')
+        return selected
+
+    output.extend(select(blocks))
+    for name in sorted(used_animations & set(keyframes)):
+        output.append(f'@keyframes {name}{{{_minify(keyframes[name])}}}')
+    return ''.join(output)
+
+
+def build_critical_css(log=print):
+    """Пишет static/build/critical/<шаблон>.css для каждого шаблона страницы"""
+    templates_dir = settings.BASE_DIR / 'templates'
+    output_dir = settings.ASSETS_BUILD_DIR / 'critical'
+    os.makedirs(output_dir, exist_ok=True)
+
+    with open(settings.BASE_DIR / 'static' / 'css' / 'style.css', encoding='utf-8') as f:
+        blocks = parse_css(f.read())
+    base_classes, base_ids = template_tokens(templates_dir / 'base.html')
+
+    for name in sorted(os.listdir(templates_dir)):
+        if not name.endswith('.html') or name == 'base.html':
+            continue
+        classes, ids = template_tokens(templates_dir / name)
+        css = critical_css(blocks, classes | base_classes, ids | base_ids)
+        output_path = output_dir / f'{name.removesuffix(".html")}.css'
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(css)
+        log(f'  critical/{output_path.name}: {round(len(css.encode()) / 1024, 1)} КБ')
+
+
+def build_assets(log=print):
+    log('Шрифты:')
+    build_fonts(log)
+    log('Критический CSS:')
+    build_critical_css(log)
@@ -0,0 +1,206 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+SCHEMA = """
+CREATE TABLE video (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title VARCHAR(200) NOT NULL,
+    description TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX video_created_at ON video (created_at);
+CREATE TABLE session (
+    session_key VARCHAR(40) PRIMARY KEY,
+    session_data TEXT NOT NULL,
+    expire_date REAL NOT NULL
+);
+"""
+
+
+def _connect(path, pragmas, readonly=False):
+    uri = f'file:{path}?mode=ro' if readonly else f'file:{path}'
+    conn = sqlite3.connect(uri, uri=True, isolation_level=None)
+    for key, value in pragmas.items():
+        conn.execute(f'PRAGMA {key}={value}')
+    return conn
+
+
+def _read(conn, rows):
+    """Страница галереи: количество и 6 последних видео со смещением"""
+    conn.execute('SELECT COUNT(*) FROM video').fetchone()
+    offset = random.randrange(0, max(rows - 6, 1))
+    conn.execute(
+        'SELECT id, title, description FROM video ORDER BY created_at DESC LIMIT 6 OFFSET ?',
+        (offset,),
+    ).fetchall()
+
+
+def _write(conn, rows, begin):
+    """Загрузка/редактирование: вставка, обновление и запись сессии в одной транзакции"""
+    conn.execute(begin)
+    try:
+        conn.execute(
+            'INSERT INTO video (title, description, created_at) VALUES (?, ?, ?)',
+            ('bench', 'x' * 200, time.time()),
+        )
+        conn.execute(
+            'UPDATE video SET title = ? WHERE id = ?',
+            (f'edit {time.time()}', random.randint(1, rows)),
+        )
+        conn.execute(
+            'INSERT OR REPLACE INTO session VALUES (?, ?, ?)',
+            (f'key{random.randint(1, 1000)}', 'x' * 500, time.time() + 86400),
+        )
+        conn.execute('COMMIT')
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+
+
+def _worker(path, profile, duration, write_ratio, rows, results):
+    """Один процесс = один воркер gunicorn"""
+    random.seed(os.getpid())
+    latencies = {'read': [], 'write': []}
+    errors = {'read': 0, 'write': 0}
+
+    persistent = profile['persistent']
+    conns = {}
+
+    def get_conn(kind):
+        readonly = kind == 'read' and profile['readonly_reads']
+        if persistent and kind in conns:
+            return conns[kind]
+        conn = _connect(path, profile['pragmas_ro' if readonly else 'pragmas'], readonly)
+        conn.execute(f"PRAGMA busy_timeout={profile['busy_timeout']}")
+        if persistent:
+            conns[kind] = conn
+        return conn
+
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        kind = 'write' if random.random() < write_ratio else 'read'
+        started = time.perf_counter()
+        conn = None
+        try:
+            conn = get_conn(kind)
+            if kind == 'read':
+                _read(conn, rows)
+            else:
+                _write(conn, rows, profile['begin'])
+        except sqlite3.OperationalError as e:
+            message = str(e)
+            if 'locked' not in message and 'busy' not in message:
+                raise
+            errors[kind] += 1
+            continue
+        finally:
+            if conn is not None and not persistent:
+                conn.close()
+        latencies[kind].append((time.perf_counter() - started) * 1000)
+
+    for conn in conns.values():
+        conn.close()
+    results.put((latencies, errors))
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный тест SQLite: параллельные чтения/записи до и после настройки профиля'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Количество процессов')
+        parser.add_argument('--duration', type=float, default=10, help='Длительность сценария, с')
+        parser.add_argument('--write-ratio', type=float, default=0.2, help='Доля запросов на запись')
+        parser.add_argument('--rows', type=int, default=5000, help='Количество строк в тестовой таблице')
+
+    def handle(self, *args, **options):
+        readonly_pragmas = getattr(settings, 'SQLITE_READONLY_PRAGMAS', {})
+        profiles = {
+            # Как было: журнал DELETE, новое соединение на каждый запрос,
+            # тайм-аут sqlite3 по умолчанию (5 с), отложенные транзакции
+            'baseline': {
+                'pragmas': {'journal_mode': 'DELETE'},
+                'pragmas_ro': {},
+                'busy_timeout': 5000,
+                'persistent': False,
+                'readonly_reads': False,
+                'begin': 'BEGIN',
+            },
+            # Профиль из settings.SQLITE_PRAGMAS + CONN_MAX_AGE + роутер mode=ro
+            'tuned': {
+                'pragmas': settings.SQLITE_PRAGMAS,
+                'pragmas_ro': readonly_pragmas,
+                'busy_timeout': settings.SQLITE_PRAGMAS.get('busy_timeout', 5000),
+                'persistent': True,
+                'readonly_reads': True,
+                'begin': 'BEGIN IMMEDIATE',
+            },
+        }
+
+        for name, profile in profiles.items():
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, 'bench.sqlite3')
+                self.prepare_database(path, profile, options['rows'])
+                latencies, errors = self.run_profile(path, profile, options)
+            self.report(name, latencies, errors, options['duration'])
+
+    def prepare_database(self, path, profile, rows):
+        conn = _connect(path, profile['pragmas'])
+        conn.executescript(SCHEMA)
+        conn.execute('BEGIN')
+        conn.executemany(
+            'INSERT INTO video (title, description, created_at) VALUES (?, ?, ?)',
+            ((f'video {i}', 'x' * 200, time.time() - i) for i in range(rows)),
+        )
+        conn.execute('COMMIT')
+        conn.close()
+
+    def run_profile(self, path, profile, options):
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=_worker,
+                args=(path, profile, options['duration'], options['write_ratio'], options['rows'], results),
+            )
+            for _ in range(options['workers'])
+        ]
+        for process in processes:
+            process.start()
+
+        latencies = {'read': [], 'write': []}
+        errors = {'read': 0, 'write': 0}
+        for _ in processes:
+            worker_latencies, worker_errors = results.get()
+            for kind in latencies:
+                latencies[kind].extend(worker_latencies[kind])
+                errors[kind] += worker_errors[kind]
+        for process in processes:
+            process.join()
+        return latencies, errors
+
+    def report(self, name, latencies, errors, duration):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Профиль: {name}'))
+        for kind in ('read', 'write'):
+            values = sorted(latencies[kind])
+            total = len(values) + errors[kind]
+            if not values:
+                self.stdout.write(f'  {kind:5}: успешных запросов нет, ошибок блокировки: {errors[kind]}')
+                continue
+            p95 = values[int(len(values) * 0.95) - 1] if len(values) >= 20 else values[-1]
+            p99 = values[int(len(values) * 0.99) - 1] if len(values) >= 100 else values[-1]
+            error_rate = errors[kind] / total * 100 if total else 0
+            self.stdout.write(
+                f'  {kind:5}: {len(values) / duration:8.1f} оп/с  '
+                f'p50 {statistics.median(values):7.2f} мс  '
+                f'p95 {p95:7.2f} мс  p99 {p99:7.2f} мс  '
+                f'ошибки блокировки {errors[kind]} ({error_rate:.2f}%)'
+            )
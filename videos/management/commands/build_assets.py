@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from videos.frontend import build_assets
+
+
+class Command(BaseCommand):
+    help = 'Собирает шрифты Inter (WOFF2-подмножества) и критический CSS в static/build'
+
+    def handle(self, *args, **options):
+        build_assets(log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS('✅ Фронтенд собран'))
@@ -0,0 +1,15 @@
+from django.contrib.staticfiles.management.commands.collectstatic import Command as CollectStaticCommand
+
+from videos.frontend import build_assets
+
+
+class Command(CollectStaticCommand):
+    help = 'Собирает фронтенд (шрифты, критический CSS), затем статические файлы'
+
+    def handle(self, **options):
+        # Сначала генерируем static/build, чтобы файлы попали в сборку
+        # и получили хеши и сжатые варианты
+        if not options['dry_run']:
+            verbose = options['verbosity'] >= 1
+            build_assets(log=self.stdout.write if verbose else lambda message: None)
+        return super().handle(**options)
@@ -0,0 +1,276 @@
+import json
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from videos.models import Video, iter_by_pk
+from videos.storage import VOLUME_MARKER
+
+
+class Command(BaseCommand):
+    help = 'Находит и удаляет медиа файлы без ссылок из базы и записи без файлов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только отчёт, ничего не удалять',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=3600,
+            help='Не трогать файлы и записи моложе N секунд (загрузки и переносы в процессе)',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=20,
+            help='Максимум удалений в секунду (0 — без ограничения)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Сколько имён сверять с базой за один запрос',
+        )
+        parser.add_argument(
+            '--delete-dangling-rows',
+            action='store_true',
+            help='Удалять записи Video, у которых нет видео файла',
+        )
+        parser.add_argument(
+            '--report',
+            default='',
+            help='Файл для отчёта в формате JSON Lines ("-" — stdout)',
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.rate = options['rate']
+        self.chunk_size = options['chunk_size']
+        self.min_file_time = time.time() - options['min_age']
+        self.min_created_at = timezone.now() - timedelta(seconds=options['min_age'])
+        self.last_action = 0.0
+        self.stats = {
+            'scanned_files': 0,
+            'scanned_rows': 0,
+            'skipped_recent': 0,
+            'orphan_files': 0,
+            'orphan_bytes': 0,
+            'dangling_videos': 0,
+            'dangling_thumbnails': 0,
+            'skipped_unavailable': 0,
+            'errors': 0,
+        }
+
+        # Незамонтированный том выглядит как пустой: файлы на нём нельзя
+        # отличить от удалённых, поэтому такие записи не трогаем
+        self.unavailable_volumes = [
+            volume for volume in self.volumes() if not self.volume_available(volume)
+        ]
+        for volume in self.unavailable_volumes:
+            self.stderr.write(
+                f'⚠️ Том {volume} ({self.volumes()[volume]}) не подключён или не размечен '
+                f'(нет файлов и метки {VOLUME_MARKER}): записи без найденных файлов будут пропущены'
+            )
+
+        report = options['report']
+        if report == '-':
+            self.report_file = self.stdout
+        elif report:
+            self.report_file = open(report, 'w', encoding='utf-8')
+        else:
+            self.report_file = None
+
+        try:
+            self.collect_orphan_files()
+            self.collect_dangling_rows(options['delete_dangling_rows'])
+            self.emit({'type': 'summary', 'dry_run': self.dry_run, **self.stats})
+        finally:
+            if self.report_file not in (None, self.stdout):
+                self.report_file.close()
+
+        # Если отчёт идёт в stdout, итог пишем в stderr, чтобы не ломать JSON Lines
+        out = self.stderr if report == '-' else self.stdout
+        verb = 'Найдено' if self.dry_run else 'Удалено'
+        out.write(self.style.SUCCESS(
+            f"✅ Файлов проверено: {self.stats['scanned_files']}, записей: {self.stats['scanned_rows']}. "
+            f"{verb} файлов без ссылок: {self.stats['orphan_files']} "
+            f"({round(self.stats['orphan_bytes'] / (1024 * 1024), 2)} МБ), "
+            f"записей без видео: {self.stats['dangling_videos']}, "
+            f"без превью: {self.stats['dangling_thumbnails']}, "
+            f"пропущено из-за недоступных томов: {self.stats['skipped_unavailable']}, "
+            f"ошибок: {self.stats['errors']}"
+        ))
+
+    # -------------------------------------------------------------------------
+    # Файлы без ссылок
+    # -------------------------------------------------------------------------
+
+    def volumes(self):
+        return getattr(default_storage, 'volumes', None) or {'default': default_storage.location}
+
+    def volume_available(self, volume):
+        """Доступен ли том; подключённый том заодно получает метку"""
+        storage_check = getattr(default_storage, 'volume_available', None)
+        if storage_check is None:
+            return os.path.isdir(self.volumes()[volume])
+        if not storage_check(volume):
+            return False
+        if not self.dry_run:
+            default_storage.mark_volume(volume)
+        return True
+
+    def walk(self, root, prefix):
+        """Обходит каталог через os.scandir, отдаёт (имя в хранилище, stat)"""
+        stack = [(root, prefix)]
+        while stack:
+            path, name_prefix = stack.pop()
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        name = f'{name_prefix}/{entry.name}'
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append((entry.path, name))
+                        elif entry.is_file(follow_symlinks=False):
+                            yield name, entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+
+    def collect_orphan_files(self):
+        volumes = self.volumes()
+        for volume, location in volumes.items():
+            for top_dir in settings.MEDIA_HASHED_DIRS:
+                chunk = []
+                for name, stat in self.walk(os.path.join(location, top_dir), top_dir):
+                    self.stats['scanned_files'] += 1
+                    # ctime тоже: жёсткая ссылка и copystat() при переносе
+                    # сохраняют старый mtime у только что появившегося файла
+                    if max(stat.st_mtime, stat.st_ctime) > self.min_file_time:
+                        self.stats['skipped_recent'] += 1
+                        continue
+                    chunk.append((name, stat.st_size))
+                    if len(chunk) >= self.chunk_size:
+                        self.check_files(volume, chunk, len(volumes) > 1)
+                        chunk = []
+                if chunk:
+                    self.check_files(volume, chunk, len(volumes) > 1)
+
+    def check_files(self, volume, chunk, multi_volume):
+        """Сверяет порцию файлов с базой одним запросом по индексу"""
+        names = {name for name, _ in chunk}
+        referenced = set()
+        rows = Video.objects.filter(Q(video__in=names) | Q(thumbnail__in=names))
+        for video_name, thumbnail_name in rows.values_list('video', 'thumbnail'):
+            referenced.add(video_name)
+            referenced.add(thumbnail_name)
+        referenced &= names
+
+        for name, size in chunk:
+            if name not in referenced:
+                reason = 'unreferenced'
+            elif multi_volume and default_storage.locate(name) != volume:
+                # Копия на старом томе, оставшаяся после прерванного переноса
+                reason = 'stale_copy'
+            else:
+                continue
+
+            self.stats['orphan_files'] += 1
+            self.stats['orphan_bytes'] += size
+            action = self.delete_file(volume, name)
+            self.emit({
+                'type': 'orphan_file',
+                'volume': volume,
+                'name': name,
+                'size': size,
+                'reason': reason,
+                'action': action,
+            })
+
+    def delete_file(self, volume, name):
+        if self.dry_run:
+            return 'none'
+        self.throttle()
+        location = self.volumes()[volume]
+        try:
+            os.remove(os.path.join(location, name))
+        except OSError as e:
+            self.stats['errors'] += 1
+            self.stderr.write(f'❌ Не удалось удалить {volume}:{name}: {e}')
+            return 'error'
+        return 'deleted'
+
+    # -------------------------------------------------------------------------
+    # Записи без файлов
+    # -------------------------------------------------------------------------
+
+    def file_exists(self, name, volume=None):
+        locate = getattr(default_storage, 'locate', None)
+        if locate is None:
+            return default_storage.exists(name)
+        return locate(name, volume) is not None
+
+    def collect_dangling_rows(self, delete_rows):
+        for pk, video_name, thumbnail_name, volume in self.iter_rows():
+            self.stats['scanned_rows'] += 1
+
+            video_missing = not video_name or not self.file_exists(video_name, volume)
+            thumbnail_missing = bool(thumbnail_name) and not self.file_exists(thumbnail_name)
+            if self.unavailable_volumes and ((video_missing and video_name) or thumbnail_missing):
+                # Файл может лежать на недоступном томе
+                self.stats['skipped_unavailable'] += 1
+                self.emit({'type': 'skipped_row', 'pk': pk, 'reason': 'volume_unavailable'})
+                continue
+
+            if video_missing:
+                self.stats['dangling_videos'] += 1
+                action = 'none'
+                if delete_rows and not self.dry_run:
+                    self.throttle()
+                    if thumbnail_name and not thumbnail_missing:
+                        default_storage.delete(thumbnail_name)
+                    Video.objects.filter(pk=pk).delete()
+                    action = 'deleted_row'
+                self.emit({'type': 'dangling_video', 'pk': pk, 'name': video_name, 'action': action})
+                continue
+
+            if thumbnail_missing:
+                self.stats['dangling_thumbnails'] += 1
+                action = 'none'
+                if not self.dry_run:
+                    # Пустое поле — превью пересоздастся при следующем просмотре
+                    Video.objects.filter(pk=pk).update(thumbnail=None)
+                    action = 'cleared_thumbnail'
+                self.emit({'type': 'dangling_thumbnail', 'pk': pk, 'name': thumbnail_name, 'action': action})
+
+    def iter_rows(self):
+        """Записи старше --min-age: их файлы уже не должны записываться"""
+        rows = (
+            Video.objects.filter(created_at__lte=self.min_created_at)
+            .values_list('pk', 'video', 'thumbnail', 'storage_volume')
+        )
+        return iter_by_pk(rows, self.chunk_size)
+
+    # -------------------------------------------------------------------------
+    # Утилиты
+    # -------------------------------------------------------------------------
+
+    def throttle(self):
+        """Ограничивает частоту удалений, чтобы не забивать диск"""
+        if self.rate <= 0:
+            return
+        wait = self.last_action + 1 / self.rate - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self.last_action = time.monotonic()
+
+    def emit(self, record):
+        if self.report_file is not None:
+            self.report_file.write(json.dumps(record, ensure_ascii=False) + '\n')
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from videos.models import Video
+
+
+class Command(BaseCommand):
+    help = 'Проверяет, какие видео можно отдавать потоком HLS/DASH без перекодирования'
+
+    def handle(self, *args, **options):
+        available = 0
+        videos = list(Video.objects.exclude(video='').only('pk', 'video', 'storage_volume', 'stream_available'))
+        for video in videos:
+            if video.update_stream_availability():
+                available += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Поток доступен для {available} из {len(videos)} видео'
+        ))
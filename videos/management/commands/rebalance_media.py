@@ -0,0 +1,157 @@
+import os
+import shutil
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from videos.models import Video, iter_by_pk
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит видео файлы на тома, назначенные консистентным хешированием, '
+        'и раскладывает старые файлы из плоских каталогов по хешированным подкаталогам'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что будет перенесено',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=0,
+            help='Максимальное количество переносимых файлов (0 — без ограничения)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько записей читать из базы за один запрос',
+        )
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        if not hasattr(storage, 'locate'):
+            raise CommandError('Хранилище по умолчанию не поддерживает тома (нужен ShardedMediaStorage)')
+
+        self.storage = storage
+        self.dry_run = options['dry_run']
+        limit = options['limit']
+        self.stats = {'moved': 0, 'renamed': 0, 'skipped': 0, 'missing': 0, 'changed': 0}
+
+        for video, field_name in self.iter_files(options['batch_size']):
+            if limit and self.stats['moved'] + self.stats['renamed'] >= limit:
+                break
+            self.relocate(video, field_name)
+
+        verb = 'Будет перенесено' if self.dry_run else 'Перенесено'
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {verb} между томами: {self.stats['moved']}, "
+            f"в хешированные каталоги: {self.stats['renamed']}, "
+            f"на месте: {self.stats['skipped']}, не найдено: {self.stats['missing']}, "
+            f"изменились во время переноса: {self.stats['changed']}"
+        ))
+
+    def iter_files(self, batch_size):
+        """Пары (запись, поле) для всех видео с файлом"""
+        videos = Video.objects.exclude(video='').only('pk', 'video', 'thumbnail', 'storage_volume')
+        for video in iter_by_pk(videos, batch_size):
+            yield video, 'video'
+            yield video, 'thumbnail'
+
+    def relocate(self, video, field_name):
+        """Переносит файл поля на целевой том и/или в хешированный подкаталог"""
+        storage = self.storage
+        name = getattr(video, field_name).name
+        if not name:
+            return
+
+        recorded = video.storage_volume if field_name == 'video' else None
+        current = storage.locate(name, recorded)
+        if current is None:
+            self.stats['missing'] += 1
+            self.stderr.write(f'❌ Видео #{video.pk}: файл {name} не найден ни на одном томе')
+            return
+
+        # Старые файлы лежат в videos/<имя>, thumbnails/<имя> — получаем
+        # имя в текущей раскладке; для уже разложенных оно не меняется
+        new_name = storage.generate_filename(name)
+        if new_name != name and storage.exists(new_name):
+            new_name = storage.get_available_name(new_name)
+        target = storage.volume_for(new_name)
+
+        if new_name == name and current == target:
+            if field_name == 'video' and video.storage_volume != current:
+                Video.objects.filter(pk=video.pk).update(storage_volume=current)
+            self.stats['skipped'] += 1
+            return
+
+        if new_name != name:
+            self.stdout.write(f'Видео #{video.pk}: {current}:{name} -> {target}:{new_name}')
+        else:
+            self.stdout.write(f'Видео #{video.pk}: {name} {current} -> {target}')
+        stat = 'renamed' if new_name != name else 'moved'
+        if self.dry_run:
+            self.stats[stat] += 1
+            return
+
+        try:
+            self.move_file(storage, name, current, new_name, target)
+        except FileNotFoundError:
+            # Исходный файл удалили, пока шёл перенос (удаление видео, media_gc)
+            self.stats['missing'] += 1
+            self.stderr.write(f'❌ Видео #{video.pk}: файл {name} исчез во время переноса')
+            return
+
+        # Обновляем, только если в поле всё ещё старое имя: превью могли
+        # пересоздать, а запись удалить, пока файл копировался
+        updates = {field_name: new_name}
+        if field_name == 'video':
+            updates['storage_volume'] = target
+        if not Video.objects.filter(pk=video.pk, **{field_name: name}).update(**updates):
+            os.remove(storage.volume_path(target, new_name))
+            self.stats['changed'] += 1
+            self.stderr.write(f'⚠️ Видео #{video.pk}: {field_name} изменился во время переноса, копия удалена')
+            return
+
+        try:
+            os.remove(storage.volume_path(current, name))
+        except FileNotFoundError:
+            pass
+        self.stats[stat] += 1
+
+    def move_file(self, storage, name, source_volume, new_name, target_volume):
+        """
+        Копирует файл на новое место, не прерывая чтение.
+
+        В пределах одного тома создаётся жёсткая ссылка, между томами — копия
+        во временный файл с атомарным переименованием, поэтому storage.locate()
+        видит по новому пути только полностью записанный файл. Исходный файл
+        удаляется вызывающим кодом уже после обновления записи в базе.
+        """
+        source = storage.volume_path(source_volume, name)
+        target = storage.volume_path(target_volume, new_name)
+        tmp_target = f'{target}.rebalance'
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if source_volume == target_volume:
+            try:
+                os.link(source, target)
+                return
+            except OSError:
+                pass
+
+        try:
+            with open(source, 'rb') as src, open(tmp_target, 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+                dst.flush()
+                os.fsync(dst.fileno())
+            shutil.copystat(source, tmp_target)
+            os.replace(tmp_target, target)
+        except BaseException:
+            if os.path.exists(tmp_target):
+                os.remove(tmp_target)
+            raise
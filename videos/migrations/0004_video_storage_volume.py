@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 13:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0003_alter_video_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='storage_volume',
+            field=models.CharField(blank=True, db_index=True, max_length=50, verbose_name='Том хранения'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-19 14:00
+
+import videos.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0004_video_storage_volume'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='video',
+            name='thumbnail',
+            field=models.ImageField(blank=True, db_index=True, help_text='Будет создано автоматически из видео', null=True, upload_to=videos.models.thumbnail_upload_path, verbose_name='Превью'),
+        ),
+        migrations.AlterField(
+            model_name='video',
+            name='video',
+            field=models.FileField(db_index=True, upload_to=videos.models.video_upload_path, validators=[videos.models.validate_video_size, videos.models.validate_video_extension], verbose_name='Видео файл'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0005_video_file_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='stream_available',
+            field=models.BooleanField(default=False, verbose_name='Доступен поток HLS/DASH'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-19 14:17
+
+import videos.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0006_video_stream_available'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='video',
+            name='video',
+            field=videos.models.PlacedFileField(db_index=True, upload_to=videos.models.video_upload_path, validators=[videos.models.validate_video_size, videos.models.validate_video_extension], verbose_name='Видео файл'),
+        ),
+    ]
@@ -1,11 +1,14 @@
 from django.db import models
 from django.conf import settings
+import io
 import os
 import uuid
 import cv2
 from PIL import Image
 from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
+from django.db.models.fields.files import FieldFile
+from .fmp4 import load_package, UnsupportedMediaError
 
 
 def video_upload_path(instance, filename):
@@ -44,13 +47,60 @@ def validate_video_extension(video):
         raise ValidationError(f'Недопустимый формат файла. Разрешены: {", ".join(allowed_exts)}')
 
 
+def iter_by_pk(queryset, batch_size=1000):
+    """
+    Отдаёт записи порциями по первичному ключу. В отличие от iterator(),
+    курсор SQLite не остаётся открытым, пока вызывающий код меняет ту же
+    таблицу. Для values_list() первым полем должен идти pk.
+    """
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        batch_queryset = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        batch = list(batch_queryset[:batch_size])
+        if not batch:
+            return
+        yield from batch
+        last = batch[-1]
+        last_pk = last.pk if isinstance(last, models.Model) else last[0]
+
+
+class PlacedFieldFile(FieldFile):
+    """Файл, который ищется сначала на томе из индекса размещения (storage_volume)"""
+
+    def _recorded_volume(self):
+        if 'storage_volume' in self.instance.get_deferred_fields():
+            return None
+        return self.instance.storage_volume or None
+
+    @property
+    def path(self):
+        self._require_file()
+        if not hasattr(self.storage, 'locate'):
+            return self.storage.path(self.name)
+        return self.storage.path(self.name, self._recorded_volume())
+
+    @property
+    def size(self):
+        self._require_file()
+        if not self._committed or not hasattr(self.storage, 'locate'):
+            return super().size
+        return os.path.getsize(self.path)
+
+
+class PlacedFileField(models.FileField):
+    """FileField, читающий файл с тома из индекса размещения"""
+    attr_class = PlacedFieldFile
+
+
 class Video(models.Model):
     """Модель видео"""
     title = models.CharField('Название', max_length=200, blank=True)
     description = models.TextField('Описание', blank=True)
-    video = models.FileField(
+    video = PlacedFileField(
         'Видео файл',
         upload_to=video_upload_path,
+        db_index=True,
         validators=[validate_video_size, validate_video_extension]
     )
     thumbnail = models.ImageField(
@@ -58,6 +108,7 @@ class Video(models.Model):
         upload_to=thumbnail_upload_path, 
         blank=True, 
         null=True,
+        db_index=True,
         help_text='Будет создано автоматически из видео'
     )
     duration = models.CharField('Длительность', max_length=20, blank=True, help_text='Например: 3:45')
@@ -66,6 +117,12 @@ class Video(models.Model):
     # Поле для хранения оригинального формата
     original_format = models.CharField('Оригинальный формат', max_length=10, blank=True)
 
+    # Индекс размещения: том хранилища, на котором лежит видео файл
+    storage_volume = models.CharField('Том хранения', max_length=50, blank=True, db_index=True)
+    
+    # H.264/AAC MP4 можно отдавать сегментами (HLS/DASH) без перекодирования
+    stream_available = models.BooleanField('Доступен поток HLS/DASH', default=False)
+
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Видео'
@@ -95,9 +152,39 @@ class Video(models.Model):
         
         super().save(*args, **kwargs)
         
+        # Запоминаем, на каком томе оказался файл
+        self.update_placement()
+        
         # Создаём превью из видео (после первого сохранения)
         if is_new and self.video:
             self.create_thumbnail()
+            self.update_stream_availability()
+    
+    def update_placement(self):
+        """Обновляет индекс размещения по фактическому расположению файла"""
+        if not self.video:
+            return
+        
+        locate = getattr(self.video.storage, 'locate', None)
+        volume = locate(self.video.name, self.storage_volume) if locate else ''
+        if volume and volume != self.storage_volume:
+            self.storage_volume = volume
+            Video.objects.filter(pk=self.pk).update(storage_volume=volume)
+    
+    def update_stream_availability(self):
+        """Проверяет, можно ли нарезать видео на fMP4 сегменты без перекодирования"""
+        available = False
+        if self.video:
+            try:
+                load_package(self.video.path, settings.STREAM_SEGMENT_DURATION)
+                available = True
+            except (OSError, UnsupportedMediaError) as e:
+                print(f"ℹ️ Видео #{self.pk} будет отдаваться целиком: {e}")
+        
+        if available != self.stream_available:
+            self.stream_available = available
+            Video.objects.filter(pk=self.pk).update(stream_available=available)
+        return available
     
     def create_thumbnail(self):
         """Создаёт превью из первого кадра видео (без FFmpeg, используя OpenCV)"""
@@ -112,12 +199,6 @@ class Video(models.Model):
                 print(f"Видео файл не найден: {video_path}")
                 return
             
-            # Путь для сохранения превью
-            thumbnail_dir = os.path.join(settings.MEDIA_ROOT, 'thumbnails')
-            os.makedirs(thumbnail_dir, exist_ok=True)
-            
-            thumbnail_path = os.path.join(thumbnail_dir, f'{self.pk}.jpg')
-            
             # Используем OpenCV
             cap = cv2.VideoCapture(video_path)
             success, frame = cap.read()
@@ -151,13 +232,15 @@ class Video(models.Model):
                 # Изменяем размер до целевого размера
                 img = img.resize((480, 270), Image.Resampling.LANCZOS)
                 
-                # Сохраняем
-                img.save(thumbnail_path, 'JPEG', quality=85)
+                # Кодируем в память и сохраняем через хранилище (оно выбирает каталог)
+                buffer = io.BytesIO()
+                img.save(buffer, 'JPEG', quality=85)
                 img.close()
                 
                 # Обновляем поле thumbnail в базе
-                with open(thumbnail_path, 'rb') as f:
-                    self.thumbnail.save(f'{self.pk}.jpg', ContentFile(f.read()), save=True)
+                if not self.replace_thumbnail(buffer.getvalue()):
+                    print(f"ℹ️ Видео #{self.pk} удалено, превью не сохранено")
+                    return
                 
                 print(f"✅ Превью для видео #{self.pk} создано (OpenCV)")
             else:
@@ -166,6 +249,29 @@ class Video(models.Model):
         except Exception as e:
             print(f"❌ Ошибка создания превью для видео #{self.pk}: {e}")
     
+    def replace_thumbnail(self, data):
+        """
+        Сохраняет новое превью и только после этого удаляет старый файл.
+        Запись обновляется через update(): если видео успели удалить,
+        строка не будет вставлена заново. Возвращает False, если записи нет.
+        """
+        storage = self.thumbnail.storage
+        old_name = self.thumbnail.name
+        name = storage.save(
+            self.thumbnail.field.generate_filename(self, f'{self.pk}.jpg'),
+            ContentFile(data),
+            max_length=self.thumbnail.field.max_length,
+        )
+        
+        if not Video.objects.filter(pk=self.pk).update(thumbnail=name):
+            storage.delete(name)
+            return False
+        
+        self.thumbnail.name = name
+        if old_name and old_name != name:
+            storage.delete(old_name)
+        return True
+    
     def generate_thumbnail_on_demand(self):
         """Создаёт превью по запросу (если отсутствует)"""
         thumbnail_exists = False
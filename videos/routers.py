@@ -0,0 +1,40 @@
+import contextvars
+from functools import wraps
+
+READONLY_DB_ALIAS = 'readonly'
+
+_use_readonly = contextvars.ContextVar('use_readonly_db', default=False)
+
+
+def read_only_db(view_func):
+    """Декоратор: чтения внутри представления идут через соединение mode=ro"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        token = _use_readonly.set(True)
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _use_readonly.reset(token)
+    return wrapper
+
+
+class ReadOnlyRouter:
+    """
+    Направляет чтения из представлений, помеченных read_only_db, на алиас
+    readonly. Запись всегда идёт в default, миграции — только в default.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _use_readonly.get():
+            return READONLY_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Оба алиаса смотрят в один и тот же файл базы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != READONLY_DB_ALIAS
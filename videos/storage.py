@@ -0,0 +1,158 @@
+import bisect
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils._os import safe_join
+
+# Метка в корне тома: по ней пустая точка монтирования (диск не подключён)
+# отличается от подключённого тома, на котором пока нет файлов
+VOLUME_MARKER = '.media-volume'
+
+
+def _hash(value):
+    """Стабильный 64-битный хеш строки (не зависит от PYTHONHASHSEED)"""
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """Кольцо консистентного хеширования: добавление тома переносит ~1/N файлов"""
+
+    def __init__(self, nodes, replicas=64):
+        self._ring = sorted(
+            (_hash(f'{node}#{i}'), node)
+            for node in nodes
+            for i in range(replicas)
+        )
+        self._keys = [key for key, _ in self._ring]
+
+    def get_node(self, key):
+        """Возвращает узел, отвечающий за ключ"""
+        if not self._ring:
+            return None
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+
+class ShardedMediaStorage(FileSystemStorage):
+    """
+    Хранилище медиа, распределённое по нескольким томам.
+
+    Том для файла выбирается консистентным хешированием по имени файла,
+    внутри тома файлы раскладываются по хешированным подкаталогам
+    (videos/3f/a2/12.mp4), чтобы каталоги не разрастались. Чтение ищет файл
+    сначала на целевом томе, затем на остальных — поэтому файлы, ещё не
+    перенесённые командой rebalance_media, остаются доступными.
+    """
+
+    def __init__(self, volumes=None, sharded_dirs=None, hashed_dirs=None, **kwargs):
+        self.volumes = dict(volumes or settings.MEDIA_VOLUMES)
+        self.primary_volume = next(iter(self.volumes))
+        kwargs.pop('location', None)
+        super().__init__(location=self.volumes[self.primary_volume], **kwargs)
+        # Запись идёт через хранилище конкретного тома, чтобы имя файла
+        # считалось относительно корня этого тома
+        self._volume_storages = {
+            volume: FileSystemStorage(location=path, **kwargs)
+            for volume, path in self.volumes.items()
+        }
+        self.sharded_dirs = tuple(sharded_dirs or settings.MEDIA_SHARDED_DIRS)
+        self.hashed_dirs = tuple(hashed_dirs or settings.MEDIA_HASHED_DIRS)
+        self.ring = HashRing(self.volumes)
+
+    # -------------------------------------------------------------------------
+    # Размещение
+    # -------------------------------------------------------------------------
+
+    def _top_dir(self, name):
+        return str(name).replace('\\', '/').split('/', 1)[0]
+
+    def volume_for(self, name):
+        """Том, на котором файл должен лежать по текущей конфигурации"""
+        if self._top_dir(name) in self.sharded_dirs:
+            return self.ring.get_node(str(name))
+        return self.primary_volume
+
+    def volume_path(self, volume, name):
+        """Абсолютный путь к файлу на конкретном томе"""
+        return safe_join(os.path.abspath(self.volumes[volume]), name)
+
+    def volume_available(self, volume):
+        """
+        Подключён ли том. Без метки доступным считается только непустой
+        каталог: у несмонтированного диска точка монтирования пуста.
+        """
+        location = self.volumes[volume]
+        if os.path.exists(os.path.join(location, VOLUME_MARKER)):
+            return True
+        try:
+            with os.scandir(location) as entries:
+                return any(True for _ in entries)
+        except OSError:
+            return False
+
+    def mark_volume(self, volume):
+        """Создаёт метку тома, если её ещё нет"""
+        marker = os.path.join(self.volumes[volume], VOLUME_MARKER)
+        if not os.path.exists(marker):
+            with open(marker, 'a'):
+                pass
+
+    def locate(self, name, volume=None):
+        """
+        Том, на котором файл лежит фактически (или None).
+        volume — том из индекса размещения (Video.storage_volume): если файл
+        там, остальные тома не проверяются.
+        """
+        target = self.volume_for(name)
+        candidates = [volume, target] + list(self.volumes)
+        checked = set()
+        for candidate in candidates:
+            if candidate not in self.volumes or candidate in checked:
+                continue
+            checked.add(candidate)
+            if os.path.lexists(self.volume_path(candidate, name)):
+                return candidate
+        return None
+
+    # -------------------------------------------------------------------------
+    # API Storage
+    # -------------------------------------------------------------------------
+
+    def generate_filename(self, filename):
+        """Добавляет хешированные подкаталоги: videos/12.mp4 -> videos/3f/a2/12.mp4"""
+        filename = super().generate_filename(filename)
+        dirname, basename = os.path.split(filename)
+        if self._top_dir(filename) not in self.hashed_dirs or not dirname:
+            return filename
+
+        digest = hashlib.md5(basename.encode('utf-8')).hexdigest()
+        shard = [digest[:2], digest[2:4]]
+        if dirname.replace('\\', '/').split('/')[-2:] == shard:
+            return filename
+        return os.path.join(dirname, *shard, basename).replace('\\', '/')
+
+    def _save(self, name, content):
+        volume = self.volume_for(name)
+        name = self._volume_storages[volume]._save(name, content)
+        self.mark_volume(volume)
+        return name
+
+    def path(self, name, volume=None):
+        volume = self.locate(name, volume) or self.volume_for(name)
+        return self.volume_path(volume, name)
+
+    def listdir(self, path):
+        directories, files = set(), set()
+        for volume in self.volumes:
+            full_path = self.volume_path(volume, path)
+            if not os.path.isdir(full_path):
+                continue
+            with os.scandir(full_path) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        directories.add(entry.name)
+                    else:
+                        files.add(entry.name)
+        return sorted(directories), sorted(files)
@@ -0,0 +1,51 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# Один фоновый поток на процесс gunicorn: файловые операции и OpenCV не
+# конкурируют с запросами за диск, а SQLite не получает лишних писателей
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='videos-tasks')
+
+
+def _run(func, *args):
+    close_old_connections()
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Ошибка фоновой задачи %s', func.__name__)
+    finally:
+        close_old_connections()
+
+
+def enqueue(func, *args):
+    """Ставит задачу в фоновую очередь после коммита текущей транзакции"""
+    transaction.on_commit(lambda: _executor.submit(_run, func, *args))
+
+
+def remove_files(paths):
+    """Удаляет файлы с диска (пути уже разрешены хранилищем)"""
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning('Не удалось удалить %s: %s', path, e)
+
+
+def regenerate_thumbnails(pks):
+    """Пересоздаёт превью для списка видео"""
+    from .models import Video
+
+    for pk in pks:
+        # Запись перечитываем перед каждым превью: пока задача ждала
+        # в очереди, видео могли удалить
+        video = Video.objects.filter(pk=pk).first()
+        if video is None:
+            continue
+        # Старый файл заменяется только после успешного создания нового
+        video.create_thumbnail()
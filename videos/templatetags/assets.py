@@ -0,0 +1,81 @@
+import os
+from functools import lru_cache
+
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from videos.frontend import FONT_FACES, UNICODE_RANGES, PRELOAD_FONT, font_file_name
+
+register = template.Library()
+
+
+@lru_cache(maxsize=32)
+def _read_build_file(path, mtime):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def _critical_css(template_name):
+    """Критический CSS страницы из static/build (пусто, если сборки не было)"""
+    name = os.path.splitext(os.path.basename(template_name or ''))[0]
+    path = settings.ASSETS_BUILD_DIR / 'critical' / f'{name}.css'
+    try:
+        return _read_build_file(path, os.path.getmtime(path))
+    except OSError:
+        return ''
+
+
+def _fonts_built():
+    suffix, subset = PRELOAD_FONT
+    return os.path.exists(settings.ASSETS_BUILD_DIR / 'fonts' / font_file_name(suffix, subset))
+
+
+def _font_faces():
+    rules = []
+    for _, weight, suffix in FONT_FACES:
+        for subset, unicode_range in UNICODE_RANGES.items():
+            url = static(f'build/fonts/{font_file_name(suffix, subset)}')
+            rules.append(
+                f"@font-face{{font-family:'Inter';font-style:normal;font-weight:{weight};"
+                f"font-display:swap;src:url({url}) format('woff2');unicode-range:{unicode_range}}}"
+            )
+    return ''.join(rules)
+
+
+@register.simple_tag(takes_context=True)
+def page_styles(context):
+    """
+    Стили страницы: @font-face и критический CSS встраиваются в <head>,
+    полный style.css грузится без блокировки отрисовки. Если сборка
+    (collectstatic / build_assets) не выполнялась — обычная ссылка на style.css.
+    """
+    stylesheet = static('css/style.css')
+    parts = []
+
+    if _fonts_built():
+        suffix, subset = PRELOAD_FONT
+        parts.append(format_html(
+            '<link rel="preload" href="{}" as="font" type="font/woff2" crossorigin>',
+            static(f'build/fonts/{font_file_name(suffix, subset)}'),
+        ))
+        inline_css = _font_faces()
+    else:
+        inline_css = ''
+
+    critical = _critical_css(context.template.name if context.template else '')
+    if critical:
+        parts.append(mark_safe(f'<style>{inline_css}{critical}</style>'))
+        parts.append(format_html(
+            '<link rel="preload" href="{}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">'
+            '<noscript><link rel="stylesheet" href="{}"></noscript>',
+            stylesheet, stylesheet,
+        ))
+    else:
+        if inline_css:
+            parts.append(mark_safe(f'<style>{inline_css}</style>'))
+        parts.append(format_html('<link rel="stylesheet" href="{}">', stylesheet))
+
+    return mark_safe('\n    '.join(parts))
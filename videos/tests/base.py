@@ -0,0 +1,59 @@
+import os
+import tempfile
+
+import cv2
+import numpy as np
+from django.test import override_settings
+
+# Статика в тестах без манифеста: шаблоны рендерятся без collectstatic
+TEST_STORAGES = {
+    'default': {
+        'BACKEND': 'videos.storage.ShardedMediaStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+
+class MediaTestMixin:
+    """Два временных тома медиа (default и second) вместо MEDIA_ROOT"""
+
+    def setUp(self):
+        super().setUp()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+
+        self.volumes = {
+            'default': os.path.join(tmp_dir.name, 'default'),
+            'second': os.path.join(tmp_dir.name, 'second'),
+        }
+        for location in self.volumes.values():
+            os.makedirs(location)
+
+        # Изменение STORAGES сбрасывает default_storage, и он создаётся
+        # заново уже с временными томами
+        override = override_settings(
+            MEDIA_ROOT=self.volumes['default'],
+            MEDIA_VOLUMES=self.volumes,
+            STORAGES=TEST_STORAGES,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def write_file(self, volume, name, data=b'data'):
+        """Кладёт файл на том в обход хранилища"""
+        path = os.path.join(self.volumes[volume], name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def write_video(self, volume, name, frames=5):
+        """Кладёт на том настоящий ролик, из которого OpenCV достанет кадр"""
+        path = self.write_file(volume, name, b'')
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 10, (64, 36))
+        for _ in range(frames):
+            writer.write(np.full((36, 64, 3), 128, np.uint8))
+        writer.release()
+        return path
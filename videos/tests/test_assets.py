@@ -0,0 +1,47 @@
+import os
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase, override_settings
+
+from videos.frontend import PRELOAD_FONT, font_file_name
+
+from .base import MediaTestMixin
+
+
+class PageStylesTests(MediaTestMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        build_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(build_dir.cleanup)
+        self.build_dir = Path(build_dir.name)
+        override = override_settings(ASSETS_BUILD_DIR=self.build_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def write_build_file(self, name, data=''):
+        path = self.build_dir / name
+        os.makedirs(path.parent, exist_ok=True)
+        path.write_text(data, encoding='utf-8')
+
+    def test_plain_stylesheet_without_build(self):
+        response = self.client.get('/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '<link rel="stylesheet" href="/static/css/style.css">', html=True)
+        self.assertNotContains(response, '@font-face')
+        self.assertNotContains(response, 'fonts.googleapis.com')
+
+    def test_critical_css_and_fonts_inlined_after_build(self):
+        self.write_build_file('critical/index.css', '.hero{color:red}')
+        suffix, subset = PRELOAD_FONT
+        self.write_build_file(f'fonts/{font_file_name(suffix, subset)}')
+
+        response = self.client.get('/')
+
+        self.assertContains(response, '.hero{color:red}')
+        self.assertContains(response, '@font-face')
+        self.assertContains(response, f'/static/build/fonts/{font_file_name(suffix, subset)}')
+        # Полный style.css грузится без блокировки отрисовки
+        self.assertContains(response, 'rel="preload" href="/static/css/style.css" as="style"')
+        self.assertContains(response, '<noscript><link rel="stylesheet" href="/static/css/style.css"></noscript>')
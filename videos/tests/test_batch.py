@@ -0,0 +1,286 @@
+import json
+import os
+import threading
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from videos import tasks
+from videos.models import Video
+
+from .base import MediaTestMixin
+
+
+def drain_tasks():
+    """Ждёт, пока фоновый поток выполнит всё, что уже стоит в очереди"""
+    tasks._executor.submit(lambda: None).result()
+
+
+class BatchTestMixin(MediaTestMixin):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create(username='admin', is_staff=True, is_superuser=True))
+
+    def post(self, url, payload, status_code=200):
+        response = self.client.post(url, json.dumps(payload), content_type='application/json')
+        self.assertEqual(response.status_code, status_code)
+        return response.json()
+
+    def create_video(self, title='Видео', with_files=True):
+        video = Video.objects.bulk_create([Video(title=title)])[0]
+        if with_files:
+            video.video.name = f'videos/ab/cd/{video.pk}.mp4'
+            video.thumbnail.name = f'thumbnails/ab/cd/{video.pk}.jpg'
+            video.storage_volume = 'default'
+            self.write_file('default', video.video.name)
+            self.write_file('default', video.thumbnail.name)
+            video.save(update_fields=['video', 'thumbnail', 'storage_volume'])
+        return video
+
+
+# =============================================================================
+# РЕДАКТИРОВАНИЕ
+# =============================================================================
+
+class BatchEditTests(BatchTestMixin, TestCase):
+    url = '/videos/batch/edit/'
+
+    def test_requires_superuser(self):
+        self.client.logout()
+        response = self.client.post(self.url, '{}', content_type='application/json')
+        self.assertEqual(response.status_code, 302)
+
+    def test_per_item_results(self):
+        first, second = self.create_video('Первое'), self.create_video('Второе')
+
+        data = self.post(self.url, {'items': [
+            {'id': first.pk, 'title': 'Новое', 'duration': '3:45'},
+            {'id': 404, 'title': 'Нет такого'},
+            {'id': first.pk, 'title': 'Повтор'},
+            {'id': second.pk, 'views': '10'},
+            {'id': second.pk, 'title': 'Тоже повтор'},
+        ]})
+
+        self.assertEqual(data['results'], [
+            {'id': first.pk, 'success': True},
+            {'id': 404, 'success': False, 'error': 'Видео не найдено'},
+            {'id': first.pk, 'success': False, 'error': 'Видео указано в запросе несколько раз'},
+            {'id': second.pk, 'success': False, 'error': 'Неподдерживаемое поле: views'},
+            {'id': second.pk, 'success': False, 'error': 'Видео указано в запросе несколько раз'},
+        ])
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.title, first.duration), ('Новое', '3:45'))
+        self.assertEqual(second.title, 'Второе')
+
+    def test_over_length_field_rolls_back_nothing_else(self):
+        first, second = self.create_video('Первое'), self.create_video('Второе')
+
+        data = self.post(self.url, {'items': [
+            {'id': first.pk, 'title': 'x' * 201},
+            {'id': second.pk, 'title': 'Новое'},
+        ]})
+
+        self.assertEqual(data['results'], [
+            {'id': first.pk, 'success': False, 'error': 'Поле title длиннее 200 символов'},
+            {'id': second.pk, 'success': True},
+        ])
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.title, 'Первое')
+        self.assertEqual(second.title, 'Новое')
+
+    def test_values_must_be_strings(self):
+        video = self.create_video('Первое')
+        video.description = 'Описание'
+        video.save(update_fields=['description'])
+
+        data = self.post(self.url, {'items': [{'id': video.pk, 'title': 123}]})
+        self.assertEqual(data['results'][0]['error'], 'Поле title должно быть строкой')
+
+        # null очищает поле
+        data = self.post(self.url, {'items': [{'id': video.pk, 'description': None}]})
+        self.assertTrue(data['results'][0]['success'])
+        video.refresh_from_db()
+        self.assertEqual((video.title, video.description), ('Первое', ''))
+
+    def test_invalid_ids_rejected(self):
+        video = self.create_video('Первое')
+        for pk in (str(video.pk), float(video.pk), True, None, [video.pk]):
+            with self.subTest(pk=pk):
+                data = self.post(self.url, {'items': [{'id': pk, 'title': 'Новое'}]}, status_code=400)
+                self.assertFalse(data['success'])
+        video.refresh_from_db()
+        self.assertEqual(video.title, 'Первое')
+
+    def test_malformed_requests(self):
+        for payload in ({}, {'items': []}, {'items': [1]}, {'items': [{'title': 'x'}]}, []):
+            with self.subTest(payload=payload):
+                self.post(self.url, payload, status_code=400)
+
+    def test_single_bulk_update(self):
+        videos = [self.create_video(f'Видео {i}') for i in range(3)]
+
+        with CaptureQueriesContext(connection) as queries:
+            self.post(self.url, {'items': [{'id': video.pk, 'title': 'Новое'} for video in videos]})
+
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "videos_video"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Video.objects.filter(title='Новое').count(), 3)
+
+
+# =============================================================================
+# УДАЛЕНИЕ И ПРЕВЬЮ
+# =============================================================================
+
+class BatchDeleteTests(BatchTestMixin, TestCase):
+    url = '/videos/batch/delete/'
+
+    def test_single_delete_files_removed_after_commit(self):
+        first, second, kept = self.create_video(), self.create_video(), self.create_video()
+        paths = [default_storage.path(video.video.name) for video in (first, second)]
+
+        with self.captureOnCommitCallbacks() as callbacks, CaptureQueriesContext(connection) as queries:
+            data = self.post(self.url, {'ids': [first.pk, 404, second.pk, first.pk]})
+
+        self.assertEqual(data['results'], [
+            {'id': first.pk, 'success': True},
+            {'id': 404, 'success': False, 'error': 'Видео не найдено'},
+            {'id': second.pk, 'success': True},
+            {'id': first.pk, 'success': False, 'error': 'Видео указано в запросе несколько раз'},
+        ])
+        deletes = [q['sql'] for q in queries if q['sql'].startswith('DELETE FROM "videos_video"')]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(list(Video.objects.values_list('pk', flat=True)), [kept.pk])
+
+        # До коммита файлы на месте, удаляет их фоновая задача
+        self.assertTrue(all(os.path.exists(path) for path in paths))
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        drain_tasks()
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+        self.assertTrue(os.path.exists(default_storage.path(kept.video.name)))
+
+    def test_invalid_ids_rejected(self):
+        video = self.create_video()
+        for ids in ([str(video.pk)], [1.5], [False], [], video.pk, list(range(501))):
+            with self.subTest(ids=ids):
+                self.post(self.url, {'ids': ids}, status_code=400)
+        self.assertTrue(Video.objects.filter(pk=video.pk).exists())
+
+
+class BatchThumbnailsTests(BatchTestMixin, TestCase):
+    url = '/videos/batch/thumbnails/'
+
+    def test_queues_found_videos(self):
+        first, second = self.create_video(), self.create_video()
+
+        with mock.patch('videos.tasks.regenerate_thumbnails') as regenerate:
+            with self.captureOnCommitCallbacks(execute=True):
+                data = self.post(self.url, {'ids': [second.pk, 404, first.pk, second.pk]})
+            drain_tasks()
+
+        self.assertEqual(data['results'], [
+            {'id': second.pk, 'success': True, 'status': 'queued'},
+            {'id': 404, 'success': False, 'error': 'Видео не найдено'},
+            {'id': first.pk, 'success': True, 'status': 'queued'},
+            {'id': second.pk, 'success': False, 'error': 'Видео указано в запросе несколько раз'},
+        ])
+        regenerate.assert_called_once_with([first.pk, second.pk])
+
+    def test_invalid_ids_rejected(self):
+        with mock.patch('videos.tasks.regenerate_thumbnails') as regenerate:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.post(self.url, {'ids': [1, '2']}, status_code=400)
+            drain_tasks()
+        regenerate.assert_not_called()
+
+
+# =============================================================================
+# ФОНОВЫЕ ЗАДАЧИ И ПРЕВЬЮ
+# =============================================================================
+
+class EnqueueTests(TestCase):
+    def test_runs_after_commit(self):
+        done = []
+        with self.captureOnCommitCallbacks() as callbacks:
+            tasks.enqueue(done.append, 1)
+        drain_tasks()
+        self.assertEqual(done, [])
+
+        callbacks[0]()
+        drain_tasks()
+        self.assertEqual(done, [1])
+
+    def test_errors_are_logged(self):
+        def fail():
+            raise RuntimeError('boom')
+
+        with self.assertLogs('videos.tasks', 'ERROR') as logs:
+            with self.captureOnCommitCallbacks(execute=True):
+                tasks.enqueue(fail)
+            drain_tasks()
+        self.assertIn('fail', logs.output[0])
+
+    def test_remove_files_ignores_missing(self):
+        tasks.remove_files(['/nonexistent/videos/1.mp4'])
+
+
+class ReplaceThumbnailTests(MediaTestMixin, TestCase):
+    def test_replaces_file_after_saving_new_one(self):
+        video = Video.objects.bulk_create([Video(title='Видео')])[0]
+        self.assertTrue(video.replace_thumbnail(b'first'))
+        old_name = video.thumbnail.name
+
+        self.assertTrue(video.replace_thumbnail(b'second'))
+
+        video.refresh_from_db()
+        self.assertNotEqual(video.thumbnail.name, old_name)
+        self.assertTrue(video.thumbnail.name.startswith('thumbnails/'))
+        with video.thumbnail.open('rb') as f:
+            self.assertEqual(f.read(), b'second')
+        self.assertFalse(default_storage.exists(old_name))
+
+    def test_deleted_video_not_recreated(self):
+        video = Video.objects.bulk_create([Video(title='Видео')])[0]
+        Video.objects.filter(pk=video.pk).delete()
+
+        self.assertFalse(video.replace_thumbnail(b'jpg'))
+
+        self.assertFalse(Video.objects.filter(pk=video.pk).exists())
+        self.assertFalse(default_storage.exists(default_storage.generate_filename(f'thumbnails/{video.pk}.jpg')))
+
+
+# TransactionTestCase: задача выполняется в фоновом потоке через своё
+# соединение и должна видеть закоммиченные записи
+class RegenerateThumbnailsTests(BatchTestMixin, TransactionTestCase):
+    def create_playable_video(self):
+        video = Video.objects.bulk_create([Video(title='Видео', storage_volume='default')])[0]
+        video.video.name = f'videos/ab/cd/{video.pk}.mp4'
+        self.write_video('default', video.video.name)
+        video.save(update_fields=['video'])
+        return video
+
+    def test_skips_video_deleted_while_queued(self):
+        kept, deleted = self.create_playable_video(), self.create_playable_video()
+
+        # Держим фоновый поток занятым, пока удаляем одно из видео
+        release = threading.Event()
+        tasks._executor.submit(release.wait)
+        try:
+            self.post('/videos/batch/thumbnails/', {'ids': [kept.pk, deleted.pk]})
+            Video.objects.filter(pk=deleted.pk).delete()
+        finally:
+            release.set()
+        drain_tasks()
+
+        self.assertFalse(Video.objects.filter(pk=deleted.pk).exists())
+        kept.refresh_from_db()
+        self.assertTrue(kept.thumbnail.name)
+        self.assertTrue(default_storage.exists(kept.thumbnail.name))
+        # Превью удалённого видео не сохранялось
+        self.assertFalse(default_storage.exists(default_storage.generate_filename(f'thumbnails/{deleted.pk}.jpg')))
@@ -0,0 +1,222 @@
+import os
+import random
+import struct
+import tempfile
+
+from django.test import SimpleTestCase
+
+from videos import fmp4
+from videos.fmp4 import Package, PackageCache, UnsupportedMediaError, _box, _full_box
+
+
+# =============================================================================
+# СИНТЕТИЧЕСКИЙ MP4
+# =============================================================================
+
+VIDEO_SAMPLES = 10          # по 500 единиц при timescale 1000 — 5 секунд
+VIDEO_SYNC = (1, 5, 9)      # ключевые кадры (нумерация stss с единицы)
+AUDIO_SAMPLES = 20          # по 250 единиц — те же 5 секунд
+
+
+def _sample(track, index):
+    return bytes([track * 16 + index % 16]) * (100 + index)
+
+
+def _elst(media_time):
+    return _box(b'edts', _full_box(b'elst', 0, 0, struct.pack('>IIiI', 1, 5000, media_time, 0x00010000)))
+
+
+def _trak(track_id, handler, sample_entry, count, delta, first_offset, tables, media_time=None):
+    sizes = [len(_sample(track_id, i)) for i in range(count)]
+    default_tables = {
+        'stsd': _full_box(b'stsd', 0, 0, struct.pack('>I', 1), sample_entry),
+        'stts': _full_box(b'stts', 0, 0, struct.pack('>III', 1, count, delta)),
+        'stsz': _full_box(b'stsz', 0, 0, struct.pack('>II', 0, count), *(struct.pack('>I', s) for s in sizes)),
+        'stsc': _full_box(b'stsc', 0, 0, struct.pack('>IIII', 1, 1, count, 1)),
+        'stco': _full_box(b'stco', 0, 0, struct.pack('>II', 1, first_offset)),
+    }
+    if handler == b'vide':
+        default_tables['stss'] = _full_box(
+            b'stss', 0, 0, struct.pack('>I', len(VIDEO_SYNC)), *(struct.pack('>I', n) for n in VIDEO_SYNC)
+        )
+    default_tables.update(tables)
+    stbl = _box(b'stbl', *(box for box in default_tables.values() if box is not None))
+
+    tkhd = _full_box(b'tkhd', 0, 3, struct.pack('>IIIII', 0, 0, track_id, 0, 5000), bytes(52), struct.pack('>II', 320 << 16, 240 << 16))
+    mdhd = _full_box(b'mdhd', 0, 0, struct.pack('>IIIIHH', 0, 0, 1000, count * delta, 0x55C4, 0))
+    hdlr = _full_box(b'hdlr', 0, 0, struct.pack('>I', 0), handler, bytes(12), b'\0')
+    edts = _elst(media_time) if media_time is not None else b''
+    return _box(b'trak', tkhd, edts, _box(b'mdia', mdhd, hdlr, _box(b'minf', stbl)))
+
+
+def build_mp4(video_tables=None, audio_tables=None, video_media_time=None, audio_media_time=None):
+    """H.264 + AAC файл с moov в конце; таблицы дорожек можно подменить"""
+    avc1 = _box(b'avc1', bytes(78), _box(b'avcC', bytes([1, 0x64, 0x00, 0x1F, 0xFF, 0xE0, 0x00])))
+    mp4a = _box(b'mp4a', bytes(6), struct.pack('>H', 1), bytes(20))
+
+    ftyp = _box(b'ftyp', b'isom', struct.pack('>I', 0x200), b'isomiso2avc1mp41')
+    video_data = b''.join(_sample(1, i) for i in range(VIDEO_SAMPLES))
+    audio_data = b''.join(_sample(2, i) for i in range(AUDIO_SAMPLES))
+    mdat = _box(b'mdat', video_data, audio_data)
+    video_offset = len(ftyp) + 8
+
+    mvhd = _full_box(b'mvhd', 0, 0, struct.pack('>IIII', 0, 0, 1000, 5000), bytes(80))
+    moov = _box(
+        b'moov',
+        mvhd,
+        _trak(1, b'vide', avc1, VIDEO_SAMPLES, 500, video_offset, video_tables or {}, video_media_time),
+        _trak(2, b'soun', mp4a, AUDIO_SAMPLES, 250, video_offset + len(video_data), audio_tables or {}, audio_media_time),
+    )
+    return ftyp + mdat + moov
+
+
+class MP4TestCase(SimpleTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def write(self, data, name='video.mp4'):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+
+# =============================================================================
+# РАЗБОР И ФРАГМЕНТЫ
+# =============================================================================
+
+class PackageTests(MP4TestCase):
+    def test_valid_file(self):
+        package = Package(self.write(build_mp4()), segment_duration=2)
+
+        self.assertEqual(package.codecs, 'avc1.64001f,mp4a.40.2')
+        self.assertEqual(len(package.segments), 3)
+        self.assertEqual(package.duration, 5)
+        self.assertIn('#EXT-X-ENDLIST', package.hls_playlist())
+
+    def test_fragments_contain_source_samples(self):
+        package = Package(self.write(build_mp4()), segment_duration=2)
+
+        for track_id, count in ((1, VIDEO_SAMPLES), (2, AUDIO_SAMPLES)):
+            payload = b''
+            for index in range(len(package.segments)):
+                length, chunks = package.fragment(index, track_id)
+                data = b''.join(chunks)
+                self.assertEqual(len(data), length)
+                payload += data[data.index(b'mdat') + 4:]
+            self.assertEqual(payload, b''.join(_sample(track_id, i) for i in range(count)))
+
+    def test_dash_presentation_time_offset_from_edit_list(self):
+        path = self.write(build_mp4(video_media_time=1000, audio_media_time=0))
+        package = Package(path, segment_duration=2)
+        manifest = package.dash_manifest()
+
+        self.assertIn('timescale="1000" presentationTimeOffset="1000"', manifest)
+        self.assertEqual(manifest.count('presentationTimeOffset'), 1)
+        # Правка остаётся только в мультиплексированном init-сегменте (HLS)
+        self.assertIn(b'elst', package.init_segment())
+        self.assertNotIn(b'elst', package.init_segment(1))
+
+
+# =============================================================================
+# ПОВРЕЖДЁННЫЕ ФАЙЛЫ
+# =============================================================================
+
+class CorruptFileTests(MP4TestCase):
+    def assertUnsupported(self, data):
+        with self.assertRaises(UnsupportedMediaError):
+            Package(self.write(data), segment_duration=2)
+
+    def test_truncated_file(self):
+        data = build_mp4()
+        moov_start = data.index(b'moov') - 4
+        for cut in range(moov_start, len(data), 7):
+            with self.subTest(cut=cut):
+                self.assertUnsupported(data[:cut])
+
+    def test_random_corruption_raises_only_unsupported(self):
+        data = build_mp4()
+        moov_start = data.index(b'moov') + 4
+        rnd = random.Random(0)
+        for attempt in range(300):
+            corrupted = bytearray(data)
+            for _ in range(rnd.randint(1, 4)):
+                corrupted[rnd.randrange(moov_start, len(data))] = rnd.randrange(256)
+            with self.subTest(attempt=attempt):
+                try:
+                    package = Package(self.write(bytes(corrupted)), segment_duration=2)
+                except UnsupportedMediaError:
+                    continue
+                package.dash_manifest()
+                package.init_segment()
+
+    def test_huge_constant_sample_count(self):
+        stsz = _full_box(b'stsz', 0, 0, struct.pack('>II', 1, 0xFFFFFFF0))
+        self.assertUnsupported(build_mp4(video_tables={'stsz': stsz}))
+
+    def test_constant_sizes_larger_than_file(self):
+        stsz = _full_box(b'stsz', 0, 0, struct.pack('>II', 1 << 20, VIDEO_SAMPLES))
+        self.assertUnsupported(build_mp4(video_tables={'stsz': stsz}))
+
+    def test_entry_count_larger_than_box(self):
+        stts = _full_box(b'stts', 0, 0, struct.pack('>III', 0x7FFFFFFF, VIDEO_SAMPLES, 500))
+        self.assertUnsupported(build_mp4(video_tables={'stts': stts}))
+
+    def test_stts_count_does_not_match_samples(self):
+        stts = _full_box(b'stts', 0, 0, struct.pack('>III', 1, 0xFFFFFFFF, 500))
+        self.assertUnsupported(build_mp4(video_tables={'stts': stts}))
+
+    def test_ctts_count_does_not_match_samples(self):
+        ctts = _full_box(b'ctts', 0, 0, struct.pack('>III', 1, 0xFFFFFFFF, 0))
+        self.assertUnsupported(build_mp4(video_tables={'ctts': ctts}))
+
+    def test_missing_tables(self):
+        for name in ('stts', 'stsc', 'stsz', 'stco'):
+            with self.subTest(table=name):
+                self.assertUnsupported(build_mp4(audio_tables={name: None}))
+
+    def test_chunk_index_out_of_range(self):
+        stsc = _full_box(b'stsc', 0, 0, struct.pack('>IIII', 1, 5, VIDEO_SAMPLES, 1))
+        self.assertUnsupported(build_mp4(video_tables={'stsc': stsc}))
+
+    def test_sync_sample_out_of_range(self):
+        stss = _full_box(b'stss', 0, 0, struct.pack('>III', 2, 1, 1000))
+        self.assertUnsupported(build_mp4(video_tables={'stss': stss}))
+
+    def test_chunk_offset_outside_file(self):
+        stco = _full_box(b'stco', 0, 0, struct.pack('>II', 1, 0xFFFFFF00))
+        self.assertUnsupported(build_mp4(video_tables={'stco': stco}))
+
+
+# =============================================================================
+# КЕШ
+# =============================================================================
+
+class PackageCacheTests(MP4TestCase):
+    def test_reuses_package_until_file_changes(self):
+        cache = PackageCache()
+        path = self.write(build_mp4())
+
+        package = cache.get(path, 2)
+        self.assertIs(cache.get(path, 2), package)
+
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertIsNot(cache.get(path, 2), package)
+
+    def test_evicts_by_sample_count(self):
+        samples = VIDEO_SAMPLES + AUDIO_SAMPLES
+        cache = PackageCache(max_samples=samples * 2)
+        paths = [self.write(build_mp4(), f'{i}.mp4') for i in range(3)]
+
+        first = cache.get(paths[0], 2)
+        cache.get(paths[1], 2)
+        cache.get(paths[2], 2)
+        self.assertEqual(len(cache._entries), 2)
+        self.assertIsNot(cache.get(paths[0], 2), first)
+
+    def test_load_package_uses_module_cache(self):
+        path = self.write(build_mp4())
+        self.addCleanup(fmp4._package_cache.clear)
+        self.assertIs(fmp4.load_package(path, 2), fmp4.load_package(path, 2))
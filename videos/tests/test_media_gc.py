@@ -0,0 +1,238 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from videos.models import Video
+from videos.storage import VOLUME_MARKER
+
+from .base import MediaTestMixin
+
+
+class MediaGcTests(MediaTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for volume in self.volumes:
+            default_storage.mark_volume(volume)
+
+    def gc(self, *args):
+        """Запускает media_gc и возвращает записи отчёта"""
+        report_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(report_dir.cleanup)
+        report = os.path.join(report_dir.name, 'report.jsonl')
+        self.stderr = StringIO()
+        call_command(
+            'media_gc', '--rate', '0', '--report', report, *args,
+            stdout=StringIO(), stderr=self.stderr,
+        )
+        with open(report, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def records(self, report, record_type):
+        return [record for record in report if record['type'] == record_type]
+
+    def create_video(self, name, volume=None, thumbnail=''):
+        """Запись с файлом, положенным на нужный том"""
+        volume = volume or default_storage.volume_for(name)
+        self.write_file(volume, name)
+        if thumbnail:
+            self.write_file('default', thumbnail)
+        return Video.objects.bulk_create([Video(video=name, thumbnail=thumbnail, storage_volume=volume)])[0]
+
+    def other_volume(self, name):
+        return 'second' if default_storage.volume_for(name) == 'default' else 'default'
+
+    # -------------------------------------------------------------------------
+    # Файлы без ссылок
+    # -------------------------------------------------------------------------
+
+    def test_unreferenced_files_deleted_referenced_kept(self):
+        self.create_video('videos/ab/cd/1.mp4', thumbnail='thumbnails/ab/cd/1.jpg')
+        orphan = self.write_file('second', 'videos/ef/01/2.mp4', b'x' * 10)
+
+        report = self.gc('--min-age', '0')
+
+        [record] = self.records(report, 'orphan_file')
+        self.assertEqual(record, {
+            'type': 'orphan_file', 'volume': 'second', 'name': 'videos/ef/01/2.mp4',
+            'size': 10, 'reason': 'unreferenced', 'action': 'deleted',
+        })
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(default_storage.exists('videos/ab/cd/1.mp4'))
+        self.assertTrue(default_storage.exists('thumbnails/ab/cd/1.jpg'))
+
+    def test_dry_run_deletes_nothing(self):
+        video = self.create_video('videos/1.mp4', thumbnail='thumbnails/1.jpg')
+        orphan = self.write_file('default', 'videos/2.mp4')
+        dangling = Video.objects.bulk_create([Video(video='videos/404.mp4')])[0]
+        os.remove(default_storage.path('thumbnails/1.jpg'))
+
+        report = self.gc('--min-age', '0', '--dry-run', '--delete-dangling-rows')
+
+        self.assertEqual([r['action'] for r in self.records(report, 'orphan_file')], ['none'])
+        self.assertEqual([r['action'] for r in self.records(report, 'dangling_video')], ['none'])
+        self.assertEqual([r['action'] for r in self.records(report, 'dangling_thumbnail')], ['none'])
+        self.assertTrue(os.path.exists(orphan))
+        self.assertTrue(Video.objects.filter(pk=dangling.pk).exists())
+        video.refresh_from_db()
+        self.assertEqual(video.thumbnail.name, 'thumbnails/1.jpg')
+
+    def test_stale_copy_removed(self):
+        name = 'videos/ab/cd/1.mp4'
+        target = default_storage.volume_for(name)
+        self.create_video(name, volume=target)
+        # Копия на другом томе, оставшаяся после прерванного переноса
+        stale = self.write_file(self.other_volume(name), name)
+
+        report = self.gc('--min-age', '0')
+
+        [record] = self.records(report, 'orphan_file')
+        self.assertEqual((record['volume'], record['reason']), (self.other_volume(name), 'stale_copy'))
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(default_storage.volume_path(target, name)))
+
+    def test_min_age_skips_recent_files(self):
+        orphan = self.write_file('default', 'videos/1.mp4')
+
+        report = self.gc('--min-age', '3600')
+
+        self.assertEqual(self.records(report, 'orphan_file'), [])
+        self.assertEqual(self.records(report, 'summary')[0]['skipped_recent'], 1)
+        self.assertTrue(os.path.exists(orphan))
+
+    def test_min_age_uses_ctime(self):
+        # Жёсткая ссылка или copystat() оставляют старый mtime,
+        # но ctime у только что перенесённого файла свежий
+        orphan = self.write_file('default', 'videos/1.mp4')
+        old = time.time() - 7200
+        os.utime(orphan, (old, old))
+
+        report = self.gc('--min-age', '3600')
+
+        self.assertEqual(self.records(report, 'orphan_file'), [])
+        self.assertTrue(os.path.exists(orphan))
+
+    # -------------------------------------------------------------------------
+    # Записи без файлов
+    # -------------------------------------------------------------------------
+
+    def test_dangling_rows_reported_but_kept_by_default(self):
+        video = Video.objects.bulk_create([Video(video='videos/404.mp4')])[0]
+
+        report = self.gc('--min-age', '0')
+
+        self.assertEqual(self.records(report, 'dangling_video'), [
+            {'type': 'dangling_video', 'pk': video.pk, 'name': 'videos/404.mp4', 'action': 'none'},
+        ])
+        self.assertTrue(Video.objects.filter(pk=video.pk).exists())
+
+    def test_delete_dangling_rows(self):
+        thumbnail = self.write_file('default', 'thumbnails/1.jpg')
+        dangling = Video.objects.bulk_create([Video(video='videos/404.mp4', thumbnail='thumbnails/1.jpg')])[0]
+        kept = self.create_video('videos/1.mp4')
+
+        report = self.gc('--min-age', '0', '--delete-dangling-rows')
+
+        self.assertEqual([r['action'] for r in self.records(report, 'dangling_video')], ['deleted_row'])
+        self.assertFalse(Video.objects.filter(pk=dangling.pk).exists())
+        self.assertFalse(os.path.exists(thumbnail))
+        self.assertTrue(Video.objects.filter(pk=kept.pk).exists())
+
+    def test_dangling_thumbnail_cleared(self):
+        video = self.create_video('videos/1.mp4')
+        Video.objects.filter(pk=video.pk).update(thumbnail='thumbnails/404.jpg')
+
+        report = self.gc('--min-age', '0')
+
+        self.assertEqual([r['action'] for r in self.records(report, 'dangling_thumbnail')], ['cleared_thumbnail'])
+        video.refresh_from_db()
+        self.assertFalse(video.thumbnail)
+
+    def test_min_age_skips_recent_rows(self):
+        recent = Video.objects.bulk_create([Video(video='videos/404.mp4')])[0]
+        old = Video.objects.bulk_create([Video(video='videos/405.mp4')])[0]
+        Video.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(hours=2))
+
+        report = self.gc('--min-age', '3600', '--delete-dangling-rows')
+
+        self.assertEqual([r['pk'] for r in self.records(report, 'dangling_video')], [old.pk])
+        self.assertTrue(Video.objects.filter(pk=recent.pk).exists())
+        self.assertFalse(Video.objects.filter(pk=old.pk).exists())
+
+    def test_rows_on_unavailable_volume_skipped(self):
+        # Несмонтированный диск: пустая точка монтирования без метки
+        os.remove(os.path.join(self.volumes['second'], VOLUME_MARKER))
+        video = Video.objects.bulk_create([Video(video='videos/404.mp4', storage_volume='second')])[0]
+
+        report = self.gc('--min-age', '0', '--delete-dangling-rows')
+
+        self.assertEqual(self.records(report, 'skipped_row'), [
+            {'type': 'skipped_row', 'pk': video.pk, 'reason': 'volume_unavailable'},
+        ])
+        self.assertEqual(self.records(report, 'summary')[0]['skipped_unavailable'], 1)
+        self.assertIn('second', self.stderr.getvalue())
+        self.assertTrue(Video.objects.filter(pk=video.pk).exists())
+        # Недоступный том не размечается заново
+        self.assertFalse(os.path.exists(os.path.join(self.volumes['second'], VOLUME_MARKER)))
+
+    def test_missing_volume_directory_is_unavailable(self):
+        shutil.rmtree(self.volumes['second'])
+        Video.objects.bulk_create([Video(video='videos/404.mp4', storage_volume='second')])
+
+        report = self.gc('--min-age', '0', '--delete-dangling-rows')
+
+        self.assertEqual(len(self.records(report, 'skipped_row')), 1)
+        self.assertEqual(Video.objects.count(), 1)
+
+    def test_unmarked_volume_with_files_gets_marked(self):
+        marker = os.path.join(self.volumes['second'], VOLUME_MARKER)
+        os.remove(marker)
+        self.write_file('second', 'videos/ab/cd/1.mp4')
+
+        self.gc('--min-age', '0', '--dry-run')
+        self.assertFalse(os.path.exists(marker))
+        self.gc('--min-age', '0')
+        self.assertTrue(os.path.exists(marker))
+
+    # -------------------------------------------------------------------------
+    # Отчёт
+    # -------------------------------------------------------------------------
+
+    def test_report_summary(self):
+        self.create_video('videos/1.mp4', thumbnail='thumbnails/1.jpg')
+        self.write_file('default', 'thumbnails/2.jpg', b'x' * 5)
+        Video.objects.bulk_create([Video(video='videos/404.mp4')])
+
+        report = self.gc('--min-age', '0')
+
+        self.assertEqual(report[-1], {
+            'type': 'summary',
+            'dry_run': False,
+            'scanned_files': 3,
+            'scanned_rows': 2,
+            'skipped_recent': 0,
+            'orphan_files': 1,
+            'orphan_bytes': 5,
+            'dangling_videos': 1,
+            'dangling_thumbnails': 0,
+            'skipped_unavailable': 0,
+            'errors': 0,
+        })
+
+    def test_report_to_stdout(self):
+        self.write_file('default', 'videos/1.mp4')
+        stdout, stderr = StringIO(), StringIO()
+
+        call_command('media_gc', '--min-age', '0', '--report', '-', stdout=stdout, stderr=stderr)
+
+        records = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([r['type'] for r in records], ['orphan_file', 'summary'])
+        self.assertIn('✅', stderr.getvalue())
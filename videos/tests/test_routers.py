@@ -0,0 +1,88 @@
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from videos.models import Video
+from videos.routers import READONLY_DB_ALIAS, ReadOnlyRouter, read_only_db
+
+from .base import MediaTestMixin
+
+
+class ReadOnlyRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReadOnlyRouter()
+
+    def test_reads_go_to_default_outside_decorated_views(self):
+        self.assertIsNone(self.router.db_for_read(Video))
+
+    def test_reads_go_to_readonly_inside_decorated_views(self):
+        @read_only_db
+        def view(request):
+            return self.router.db_for_read(Video), self.router.db_for_write(Video)
+
+        self.assertEqual(view(None), (READONLY_DB_ALIAS, 'default'))
+        # После выхода из представления флаг сброшен
+        self.assertIsNone(self.router.db_for_read(Video))
+
+    def test_flag_reset_after_exception(self):
+        @read_only_db
+        def view(request):
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            view(None)
+        self.assertIsNone(self.router.db_for_read(Video))
+
+    def test_migrations_only_on_default(self):
+        self.assertTrue(self.router.allow_migrate('default', 'videos'))
+        self.assertFalse(self.router.allow_migrate(READONLY_DB_ALIAS, 'videos'))
+
+
+# TransactionTestCase: в TestCase запись в default сидит в незакрытой
+# транзакции, и второе соединение к той же базе упирается в блокировку
+class ReadOnlyViewTests(MediaTestMixin, TransactionTestCase):
+    databases = {'default', READONLY_DB_ALIAS}
+
+    def capture(self, url, status_code=200):
+        with CaptureQueriesContext(connections[READONLY_DB_ALIAS]) as readonly, \
+                CaptureQueriesContext(connections['default']) as default:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status_code)
+        return [q['sql'] for q in readonly], [q['sql'] for q in default]
+
+    def test_decorated_view_reads_from_readonly(self):
+        Video.objects.bulk_create([Video(title='Видео', video='videos/1.mp4', thumbnail='thumbnails/1.jpg')])
+
+        readonly, default = self.capture('/videos/')
+
+        self.assertTrue(readonly)
+        self.assertTrue(all(sql.startswith('SELECT') for sql in readonly))
+        self.assertEqual(default, [])
+
+    def test_writes_inside_decorated_view_go_to_default(self):
+        name = 'videos/ab/cd/1.mp4'
+        self.write_video('default', name)
+        video = Video.objects.bulk_create([Video(title='Видео', video=name, storage_volume='default')])[0]
+
+        # Превью нет — video_detail создаёт его прямо во время запроса
+        readonly, default = self.capture(f'/videos/{video.pk}/')
+
+        self.assertTrue(all(sql.startswith('SELECT') for sql in readonly))
+        self.assertTrue(any(sql.startswith('UPDATE') for sql in default))
+        video.refresh_from_db()
+        self.assertTrue(video.thumbnail.name)
+        self.assertTrue(video.thumbnail.storage.exists(video.thumbnail.name))
+
+    def test_undecorated_code_uses_default(self):
+        Video.objects.bulk_create([Video(title='Видео', video='videos/1.mp4')])
+        self.client.force_login(User.objects.create_superuser('admin', password='admin'))
+
+        with CaptureQueriesContext(connections[READONLY_DB_ALIAS]) as readonly:
+            self.assertEqual(Video.objects.count(), 1)
+        self.assertEqual(readonly.captured_queries, [])
+
+        # Сессия и пользователь читаются в представлении без декоратора
+        readonly, default = self.capture('/logout/', status_code=302)
+        self.assertEqual(readonly, [])
+        self.assertTrue(any('auth_user' in sql for sql in default))
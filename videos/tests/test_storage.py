@@ -0,0 +1,252 @@
+import hashlib
+import os
+from io import StringIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from videos.management.commands import rebalance_media
+from videos.models import Video
+from videos.storage import VOLUME_MARKER, HashRing
+
+from .base import MediaTestMixin
+
+
+def hashed_name(top_dir, basename):
+    digest = hashlib.md5(basename.encode('utf-8')).hexdigest()
+    return f'{top_dir}/{digest[:2]}/{digest[2:4]}/{basename}'
+
+
+# =============================================================================
+# КОЛЬЦО И ХРАНИЛИЩЕ
+# =============================================================================
+
+class HashRingTests(SimpleTestCase):
+    def test_stable_between_instances(self):
+        keys = [f'videos/{i}.mp4' for i in range(100)]
+        first, second = HashRing(['a', 'b']), HashRing(['a', 'b'])
+        self.assertEqual([first.get_node(k) for k in keys], [second.get_node(k) for k in keys])
+
+    def test_keys_spread_over_nodes(self):
+        ring = HashRing(['a', 'b'])
+        share = sum(ring.get_node(f'videos/{i}.mp4') == 'a' for i in range(1000)) / 1000
+        self.assertGreater(share, 0.35)
+        self.assertLess(share, 0.65)
+
+    def test_new_node_takes_keys_only_for_itself(self):
+        keys = [f'videos/{i}.mp4' for i in range(1000)]
+        before, after = HashRing(['a', 'b']), HashRing(['a', 'b', 'c'])
+        moved = [k for k in keys if before.get_node(k) != after.get_node(k)]
+
+        self.assertTrue(all(after.get_node(k) == 'c' for k in moved))
+        self.assertLess(len(moved) / len(keys), 0.5)
+
+    def test_empty_ring(self):
+        self.assertIsNone(HashRing([]).get_node('videos/1.mp4'))
+
+
+class ShardedMediaStorageTests(MediaTestMixin, SimpleTestCase):
+    def test_generate_filename_adds_hashed_dirs(self):
+        self.assertEqual(default_storage.generate_filename('videos/12.mp4'), hashed_name('videos', '12.mp4'))
+        self.assertEqual(default_storage.generate_filename('thumbnails/12.jpg'), hashed_name('thumbnails', '12.jpg'))
+
+    def test_generate_filename_is_idempotent(self):
+        name = hashed_name('videos', '12.mp4')
+        self.assertEqual(default_storage.generate_filename(name), name)
+
+    def test_generate_filename_leaves_other_dirs(self):
+        self.assertEqual(default_storage.generate_filename('other/12.mp4'), 'other/12.mp4')
+
+    def test_save_places_file_on_target_volume(self):
+        for i in range(10):
+            name = default_storage.save(f'videos/{i}.mp4', ContentFile(b'video'))
+            volume = default_storage.volume_for(name)
+            with self.subTest(name=name):
+                self.assertTrue(os.path.exists(os.path.join(self.volumes[volume], name)))
+                self.assertEqual(default_storage.path(name), os.path.join(self.volumes[volume], name))
+
+    def test_thumbnails_stay_on_primary_volume(self):
+        name = default_storage.save('thumbnails/1.jpg', ContentFile(b'jpg'))
+        self.assertEqual(default_storage.locate(name), 'default')
+
+    def test_empty_volume_unavailable_until_marked(self):
+        # Пустой каталог не отличить от точки монтирования без диска
+        self.assertFalse(default_storage.volume_available('second'))
+        self.write_file('second', 'videos/1.mp4')
+        self.assertTrue(default_storage.volume_available('second'))
+
+    def test_save_marks_volume(self):
+        name = default_storage.save('thumbnails/1.jpg', ContentFile(b'jpg'))
+        default_storage.delete(name)
+        self.assertTrue(os.path.exists(os.path.join(self.volumes['default'], VOLUME_MARKER)))
+        self.assertTrue(default_storage.volume_available('default'))
+
+    def test_locate_checks_recorded_volume_first(self):
+        name = hashed_name('videos', '1.mp4')
+        other = 'second' if default_storage.volume_for(name) == 'default' else 'default'
+        self.write_file(other, name)
+
+        with mock.patch('videos.storage.os.path.lexists', wraps=os.path.lexists) as lexists:
+            self.assertEqual(default_storage.locate(name, other), other)
+        lexists.assert_called_once_with(os.path.join(self.volumes[other], name))
+
+    def test_locate_falls_back_to_other_volumes(self):
+        name = hashed_name('videos', '1.mp4')
+        other = 'second' if default_storage.volume_for(name) == 'default' else 'default'
+        self.write_file(other, name)
+
+        # Неверный том в индексе и файл не на целевом томе — всё равно найден
+        self.assertEqual(default_storage.locate(name, default_storage.volume_for(name)), other)
+        self.assertEqual(default_storage.locate(name, 'unknown'), other)
+        self.assertEqual(default_storage.path(name), os.path.join(self.volumes[other], name))
+        self.assertTrue(default_storage.exists(name))
+
+    def test_missing_file(self):
+        name = hashed_name('videos', '404.mp4')
+        self.assertIsNone(default_storage.locate(name))
+        self.assertFalse(default_storage.exists(name))
+
+    def test_listdir_merges_volumes(self):
+        self.write_file('default', 'videos/a.mp4')
+        self.write_file('second', 'videos/b.mp4')
+        self.write_file('second', 'videos/3f/c.mp4')
+        self.assertEqual(default_storage.listdir('videos'), (['3f'], ['a.mp4', 'b.mp4']))
+
+
+class PlacedFieldFileTests(MediaTestMixin, TestCase):
+    def create_video(self, volume):
+        name = hashed_name('videos', f'{volume}.mp4')
+        self.write_file(volume, name, b'x' * 42)
+        # bulk_create не вызывает save(): превью и проверка потока не нужны
+        return Video.objects.bulk_create([Video(video=name, storage_volume=volume)])[0]
+
+    def test_path_and_size_use_recorded_volume(self):
+        for volume in self.volumes:
+            video = Video.objects.get(pk=self.create_video(volume).pk)
+            expected = os.path.join(self.volumes[volume], video.video.name)
+            with mock.patch('videos.storage.os.path.lexists', wraps=os.path.lexists) as lexists:
+                self.assertEqual(video.video.path, expected)
+                self.assertEqual(video.video.size, 42)
+            with self.subTest(volume=volume):
+                self.assertEqual({call.args[0] for call in lexists.call_args_list}, {expected})
+
+    def test_deferred_storage_volume_does_not_query(self):
+        pk = self.create_video('second').pk
+        video = Video.objects.only('pk', 'video').get(pk=pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(video.video.path.startswith(self.volumes['second']))
+
+
+# =============================================================================
+# REBALANCE_MEDIA
+# =============================================================================
+
+class RebalanceMediaTests(MediaTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # Файлы в старой плоской раскладке, всё на основном томе
+        videos = []
+        for i in range(12):
+            self.write_file('default', f'videos/legacy{i}.mp4', b'video%d' % i)
+            self.write_file('default', f'thumbnails/legacy{i}.jpg', b'jpg%d' % i)
+            videos.append(Video(
+                title=f'legacy {i}',
+                video=f'videos/legacy{i}.mp4',
+                thumbnail=f'thumbnails/legacy{i}.jpg',
+            ))
+        Video.objects.bulk_create(videos)
+
+    def rebalance(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('rebalance_media', *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_moves_and_renames_legacy_files(self):
+        self.rebalance()
+
+        volumes = set()
+        for i, video in enumerate(Video.objects.order_by('pk')):
+            video_name = hashed_name('videos', f'legacy{i}.mp4')
+            thumbnail_name = hashed_name('thumbnails', f'legacy{i}.jpg')
+            volume = default_storage.volume_for(video_name)
+            volumes.add(volume)
+            with self.subTest(video=video.pk):
+                self.assertEqual(video.video.name, video_name)
+                self.assertEqual(video.storage_volume, volume)
+                self.assertEqual(video.thumbnail.name, thumbnail_name)
+                with open(os.path.join(self.volumes[volume], video_name), 'rb') as f:
+                    self.assertEqual(f.read(), b'video%d' % i)
+                self.assertTrue(os.path.exists(os.path.join(self.volumes['default'], thumbnail_name)))
+
+        self.assertEqual(volumes, {'default', 'second'})
+        # В плоских каталогах не осталось ни одного файла
+        self.assertFalse(any(
+            name.endswith(('.mp4', '.jpg'))
+            for top_dir in ('videos', 'thumbnails')
+            for name in os.listdir(os.path.join(self.volumes['default'], top_dir))
+        ))
+
+        # Повторный запуск ничего не переносит
+        stdout, _ = self.rebalance()
+        self.assertIn('между томами: 0, в хешированные каталоги: 0, на месте: 24', stdout)
+
+    def test_dry_run_changes_nothing(self):
+        stdout, _ = self.rebalance('--dry-run')
+
+        self.assertIn('в хешированные каталоги: 24', stdout)
+        self.assertEqual(Video.objects.filter(video__startswith='videos/legacy').count(), 12)
+        self.assertEqual(len(os.listdir(os.path.join(self.volumes['default'], 'videos'))), 12)
+
+    def test_limit(self):
+        self.rebalance('--limit', '5')
+        moved = Video.objects.exclude(video__startswith='videos/legacy').count()
+        moved += Video.objects.exclude(thumbnail__startswith='thumbnails/legacy').count()
+        self.assertEqual(moved, 5)
+
+    def test_field_changed_during_move_keeps_new_value(self):
+        video = Video.objects.order_by('pk').first()
+        real_move = rebalance_media.Command.move_file
+
+        def move_and_regenerate(command, storage, name, *args):
+            real_move(command, storage, name, *args)
+            if name.startswith('thumbnails/'):
+                # Превью пересоздали, пока файл копировался
+                Video.objects.filter(pk=video.pk).update(thumbnail='thumbnails/new.jpg')
+
+        with mock.patch.object(rebalance_media.Command, 'move_file', move_and_regenerate):
+            _, stderr = self.rebalance('--limit', '2')
+
+        video.refresh_from_db()
+        self.assertEqual(video.thumbnail.name, 'thumbnails/new.jpg')
+        self.assertIn('изменился во время переноса', stderr)
+        # Старый файл остался, новая копия удалена
+        self.assertTrue(os.path.exists(os.path.join(self.volumes['default'], 'thumbnails/legacy0.jpg')))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.volumes['default'], hashed_name('thumbnails', 'legacy0.jpg'))
+        ))
+
+    def test_source_removed_during_move(self):
+        real_move = rebalance_media.Command.move_file
+
+        def move_and_remove_source(command, storage, name, source_volume, *args):
+            real_move(command, storage, name, source_volume, *args)
+            os.remove(storage.volume_path(source_volume, name))
+
+        with mock.patch.object(rebalance_media.Command, 'move_file', move_and_remove_source):
+            self.rebalance()
+
+        self.assertFalse(Video.objects.filter(video__startswith='videos/legacy').exists())
+
+    def test_source_missing_before_copy(self):
+        def vanished(*args):
+            raise FileNotFoundError
+
+        with mock.patch.object(rebalance_media.Command, 'move_file', vanished):
+            stdout, stderr = self.rebalance()
+
+        self.assertIn('не найдено: 24', stdout)
+        self.assertIn('исчез во время переноса', stderr)
+        self.assertEqual(Video.objects.filter(video__startswith='videos/legacy').count(), 12)
@@ -8,9 +8,20 @@ urlpatterns = [
     path('videos/delete/<int:pk>/', views.delete_video, name='delete_video'),
     path('videos/edit/<int:pk>/', views.edit_video, name='edit_video'),
     path('videos/thumbnail/<int:pk>/', views.generate_thumbnail, name='generate_thumbnail'),
+    path('videos/batch/edit/', views.batch_edit_videos, name='batch_edit_videos'),
+    path('videos/batch/delete/', views.batch_delete_videos, name='batch_delete_videos'),
+    path('videos/batch/thumbnails/', views.batch_generate_thumbnails, name='batch_generate_thumbnails'),
     path('videos/conclusion/', views.conclusion, name='conclusion'),
     path('videos/<int:pk>/', views.video_detail, name='video_detail'),
     
+    # Потоковое воспроизведение (fMP4 без перекодирования)
+    path('videos/<int:pk>/stream/index.m3u8', views.stream_playlist, name='video_stream_playlist'),
+    path('videos/<int:pk>/stream/manifest.mpd', views.stream_manifest, name='video_stream_manifest'),
+    path('videos/<int:pk>/stream/init.mp4', views.stream_init, name='video_stream_init'),
+    path('videos/<int:pk>/stream/init-<int:track_id>.mp4', views.stream_init, name='video_stream_track_init'),
+    path('videos/<int:pk>/stream/<int:index>.m4s', views.stream_segment, name='video_stream_segment'),
+    path('videos/<int:pk>/stream/<int:index>-<int:track_id>.m4s', views.stream_segment, name='video_stream_track_segment'),
+    
     # Авторизация
     path('login/', views.user_login, name='login'),
     path('logout/', views.user_logout, name='logout'),
@@ -1,21 +1,31 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.core.paginator import Paginator
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.views.static import serve
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
+from django.views.decorators.cache import cache_control
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth import authenticate, login, logout
+from django.db import transaction
 import json
 import os
 from .models import Video
+from .routers import read_only_db
+from . import tasks
+from . import fmp4
 
 
+@read_only_db
 def index(request):
     """Главная страница"""
     return render(request, 'index.html')
 
 
+@read_only_db
 def gallery(request):
     """Страница галереи видео"""
     videos_list = Video.objects.all()
@@ -31,6 +41,7 @@ def gallery(request):
     })
 
 
+@read_only_db
 def video_detail(request, pk: int):
     """Детальная страница видео"""
     video = get_object_or_404(Video, pk=pk)
@@ -41,6 +52,7 @@ def video_detail(request, pk: int):
     return render(request, 'detail.html', {'video': video})
 
 
+@read_only_db
 def conclusion(request):
     """Страница содержания"""
     videos = Video.objects.all()
@@ -233,6 +245,282 @@ def generate_thumbnail(request, pk):
         })
 
 
+# =============================================================================
+# ПАКЕТНЫЕ ОПЕРАЦИИ
+# =============================================================================
+
+BATCH_MAX_ITEMS = 500
+BATCH_EDITABLE_FIELDS = ('title', 'description', 'duration')
+BATCH_DUPLICATE_ERROR = 'Видео указано в запросе несколько раз'
+
+
+def _is_batch_id(value):
+    """id видео в JSON: только целое число (не bool, не дробное, не строка)"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _parse_batch_ids(data):
+    """Достаёт список id из тела запроса"""
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not ids:
+        raise ValueError('Передайте непустой список ids')
+    if len(ids) > BATCH_MAX_ITEMS:
+        raise ValueError(f'Не более {BATCH_MAX_ITEMS} видео за один запрос')
+    if not all(_is_batch_id(pk) for pk in ids):
+        raise ValueError('ids должны быть целыми числами')
+    return ids
+
+
+def _batch_results(ids, found, **extra):
+    """Результат на каждый переданный id: повторы и ненайденные видео — ошибки"""
+    results = []
+    seen = set()
+    for pk in ids:
+        if pk in seen:
+            results.append({'id': pk, 'success': False, 'error': BATCH_DUPLICATE_ERROR})
+        elif pk in found:
+            results.append({'id': pk, 'success': True, **extra})
+        else:
+            results.append({'id': pk, 'success': False, 'error': 'Видео не найдено'})
+        seen.add(pk)
+    return results
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@user_passes_test(is_superuser)
+def batch_edit_videos(request):
+    """Пакетное редактирование: [{"id": 1, "title": "...", "duration": "..."}, ...]"""
+    try:
+        items = json.loads(request.body).get('items')
+        if not isinstance(items, list) or not items:
+            raise ValueError('Передайте непустой список items')
+        if len(items) > BATCH_MAX_ITEMS:
+            raise ValueError(f'Не более {BATCH_MAX_ITEMS} видео за один запрос')
+        
+        entries = []
+        for item in items:
+            pk = item['id']
+            if not _is_batch_id(pk):
+                raise ValueError('id должен быть целым числом')
+            entries.append((pk, {field: value for field, value in item.items() if field != 'id'}))
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Некорректный запрос: {str(e)}'
+        }, status=400)
+    
+    try:
+        results = []
+        changed_fields = set()
+        
+        with transaction.atomic():
+            videos = Video.objects.in_bulk({pk for pk, _ in entries})
+            to_update = []
+            seen = set()
+            
+            for pk, fields in entries:
+                if pk in seen:
+                    results.append({'id': pk, 'success': False, 'error': BATCH_DUPLICATE_ERROR})
+                    continue
+                seen.add(pk)
+                
+                video = videos.get(pk)
+                if video is None:
+                    results.append({'id': pk, 'success': False, 'error': 'Видео не найдено'})
+                    continue
+                
+                error = None
+                for field, value in fields.items():
+                    if field not in BATCH_EDITABLE_FIELDS:
+                        error = f'Неподдерживаемое поле: {field}'
+                        break
+                    if value is None:
+                        fields[field] = value = ''
+                    if not isinstance(value, str):
+                        error = f'Поле {field} должно быть строкой'
+                        break
+                    max_length = Video._meta.get_field(field).max_length
+                    if max_length and len(value) > max_length:
+                        error = f'Поле {field} длиннее {max_length} символов'
+                        break
+                
+                if error:
+                    results.append({'id': pk, 'success': False, 'error': error})
+                    continue
+                
+                for field, value in fields.items():
+                    setattr(video, field, value)
+                changed_fields.update(fields)
+                to_update.append(video)
+                results.append({'id': pk, 'success': True})
+            
+            if to_update and changed_fields:
+                Video.objects.bulk_update(to_update, sorted(changed_fields), batch_size=BATCH_MAX_ITEMS)
+        
+        updated = sum(1 for result in results if result['success'])
+        return JsonResponse({
+            'success': True,
+            'message': f'Обновлено видео: {updated} из {len(results)}',
+            'results': results
+        })
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Ошибка при редактировании: {str(e)}'
+        })
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@user_passes_test(is_superuser)
+def batch_delete_videos(request):
+    """Пакетное удаление: {"ids": [1, 2, 3]} — один DELETE, файлы удаляются в фоне"""
+    try:
+        ids = _parse_batch_ids(json.loads(request.body))
+    except (ValueError, TypeError, AttributeError) as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Некорректный запрос: {str(e)}'
+        }, status=400)
+    
+    try:
+        with transaction.atomic():
+            videos = Video.objects.filter(pk__in=ids).only('pk', 'video', 'thumbnail', 'storage_volume')
+            found = set()
+            paths = []
+            for video in videos:
+                found.add(video.pk)
+                # Пути разрешаем сейчас: после удаления записи хранилище
+                # уже не сможет найти том по индексу размещения
+                for field_file in (video.video, video.thumbnail):
+                    if field_file:
+                        paths.append(field_file.path)
+            
+            Video.objects.filter(pk__in=found).delete()
+            tasks.enqueue(tasks.remove_files, paths)
+        
+        results = _batch_results(ids, found)
+        return JsonResponse({
+            'success': True,
+            'message': f'Удалено видео: {len(found)}',
+            'results': results
+        })
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Ошибка при удалении: {str(e)}'
+        })
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@user_passes_test(is_superuser)
+def batch_generate_thumbnails(request):
+    """Пакетное пересоздание превью: {"ids": [1, 2, 3]} — выполняется в фоне"""
+    try:
+        ids = _parse_batch_ids(json.loads(request.body))
+    except (ValueError, TypeError, AttributeError) as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Некорректный запрос: {str(e)}'
+        }, status=400)
+    
+    try:
+        found = set(Video.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        tasks.enqueue(tasks.regenerate_thumbnails, sorted(found))
+        
+        results = _batch_results(ids, found, status='queued')
+        return JsonResponse({
+            'success': True,
+            'message': f'Превью поставлены в очередь: {len(found)}',
+            'results': results
+        })
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Ошибка: {str(e)}'
+        })
+
+
+# =============================================================================
+# ПОТОКОВОЕ ВОСПРОИЗВЕДЕНИЕ (HLS/DASH)
+# =============================================================================
+
+def _stream_package(pk):
+    """fMP4 пакет для видео или 404, если поток недоступен"""
+    video = get_object_or_404(Video, pk=pk, stream_available=True)
+    try:
+        return fmp4.load_package(video.video.path, settings.STREAM_SEGMENT_DURATION)
+    except (OSError, fmp4.UnsupportedMediaError):
+        raise Http404('Поток недоступен')
+
+
+@read_only_db
+@cache_control(public=True, max_age=3600)
+def stream_playlist(request, pk):
+    """HLS плейлист"""
+    package = _stream_package(pk)
+    return HttpResponse(package.hls_playlist(), content_type='application/vnd.apple.mpegurl')
+
+
+@read_only_db
+@cache_control(public=True, max_age=3600)
+def stream_manifest(request, pk):
+    """DASH манифест"""
+    package = _stream_package(pk)
+    return HttpResponse(package.dash_manifest(), content_type='application/dash+xml')
+
+
+@read_only_db
+@cache_control(public=True, max_age=86400)
+def stream_init(request, pk, track_id=None):
+    """Init-сегмент: все дорожки (HLS) или одна (DASH)"""
+    package = _stream_package(pk)
+    try:
+        data = package.init_segment(track_id)
+    except KeyError:
+        raise Http404('Дорожка не найдена')
+    return HttpResponse(data, content_type='video/mp4')
+
+
+@read_only_db
+@cache_control(public=True, max_age=86400)
+def stream_segment(request, pk, index, track_id=None):
+    """Медиа-сегмент moof + mdat, данные читаются из исходного файла по частям"""
+    package = _stream_package(pk)
+    try:
+        length, chunks = package.fragment(index, track_id)
+    except (IndexError, KeyError):
+        raise Http404('Сегмент не найден')
+    
+    response = StreamingHttpResponse(chunks, content_type='video/iso.segment')
+    response['Content-Length'] = str(length)
+    return response
+
+
+# =============================================================================
+# РАЗДАЧА МЕДИА
+# =============================================================================
+
+@read_only_db
+def serve_media(request, path):
+    """Отдаёт медиа файл с того тома, на котором он фактически лежит"""
+    locate = getattr(default_storage, 'locate', None)
+    if locate is None:
+        return serve(request, path, document_root=default_storage.location)
+    
+    # Для видео том берём из индекса размещения, остальные тома проверяем,
+    # только если файла там нет
+    recorded = ''
+    if path.startswith('videos/'):
+        recorded = Video.objects.filter(video=path).values_list('storage_volume', flat=True).first() or ''
+    volume = locate(path, recorded)
+    if volume is None:
+        raise Http404('Файл не найден')
+    return serve(request, path, document_root=default_storage.volumes[volume])
+
+
 # =============================================================================
 # СИСТЕМА АВТОРИЗАЦИИ
 # =============================================================================